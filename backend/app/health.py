@@ -0,0 +1,115 @@
+import os
+import time
+import asyncio
+import logging
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from backend.services import metrics
+from backend.services.answer_cache import answer_cache
+from backend.services.concurrency import run_io
+from backend.services.embedding_cache import embedding_cache
+from backend.services.question_cache import question_cache
+from backend.services.vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "10"))
+READY_CACHE_SECONDS = float(os.getenv("READY_CACHE_SECONDS", "30"))
+
+_ready_at = 0.0
+
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving; never touches dependencies."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    """
+    Readiness: configuration is present and the vector store answers.
+    The first successful probe also warms the lazy clients; success is cached briefly.
+    """
+    global _ready_at
+    if time.monotonic() - _ready_at < READY_CACHE_SECONDS:
+        return {"status": "ready"}
+
+    checks = {
+        "bearer_token": bool(os.getenv("BEARER_TOKEN")),
+        "embedding_key": bool(os.getenv("GEMINI_EMBD_KEY")),
+        "llm_key": bool(os.getenv("GEMINI_API_KEY")),
+    }
+    try:
+        await asyncio.wait_for(run_io(get_vector_store().list_namespaces), timeout=READY_TIMEOUT)
+        checks["vector_store"] = True
+    except Exception as e:
+        logger.warning("Readiness: vector store unavailable: %s", e)
+        checks["vector_store"] = False
+
+    if all(checks.values()):
+        _ready_at = time.monotonic()
+        return {"status": "ready", "checks": checks}
+    return JSONResponse(status_code=503, content={"status": "not ready", "checks": checks})
+
+
+def _cache_families():
+    """Cache statistics, read at scrape time from the caches' own counters."""
+    embed, answer, question = embedding_cache.stats(), answer_cache.stats(), question_cache.stats()
+    lookups = [
+        ({"cache": "embedding", "result": "hit"}, embed["hits"]),
+        ({"cache": "embedding", "result": "disk_hit"}, embed["disk_hits"]),
+        ({"cache": "embedding", "result": "miss"}, embed["misses"]),
+        ({"cache": "answer", "result": "hit"}, answer["hits"]),
+        ({"cache": "answer", "result": "miss"}, answer["misses"]),
+        ({"cache": "semantic", "result": "hit"}, question["hits"]),
+        ({"cache": "semantic", "result": "miss"}, question["misses"]),
+    ]
+    items = [
+        ({"cache": "embedding"}, embed["items"]),
+        ({"cache": "answer"}, answer["items"]),
+        ({"cache": "semantic"}, question["documents"]),
+    ]
+    yield "policypal_cache_lookups_total", "counter", "Cache lookups by cache and result.", lookups
+    yield "policypal_cache_items", "gauge", "Entries held in memory (documents for the semantic cache).", items
+    vector_bytes = [
+        ({"cache": "embedding"}, embed["bytes"]),
+        ({"cache": "semantic"}, question["bytes"]),
+    ]
+    yield "policypal_cache_vector_bytes", "gauge", "Memory held by encoded vectors in each cache.", vector_bytes
+
+
+metrics.register_collector(_cache_families)
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus scrape endpoint. With METRICS_ENABLED=auto (the default) spans and
+    histograms only start recording after the first scrape.
+    """
+    metrics.activate()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def track_requests(request: Request, call_next):
+    """HTTP middleware: in-flight gauge and latency per route template."""
+    metrics.REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.dec()
+        if metrics.recording():
+            route = request.scope.get("route")
+            metrics.REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                route=getattr(route, "path", "other"),
+                status=status,
+            )
@@ -1,43 +1,53 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List
-from pydantic import BaseModel
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
 import os
+import json
+import asyncio
+import logging
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from ml.pipeline.pipeline_qa import answer_questions
-from backend.services.pinecone_store import ingest_document
+from ml.pipeline.pipeline_qa import stream_answers
+from backend.services.ingest_jobs import ingest_jobs
+from backend.services.deadline import Deadline
+from backend.services.ingestion import ProgressCallback
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 security = HTTPBearer()
 BEARER_TOKEN = os.getenv("BEARER_TOKEN")
 
+# Answer for every question when the document could not even be read in time
+UNANSWERED = "Could not process the document within the time limit."
+
 class DocumentRequest(BaseModel):
     documents: str
     questions: List[str]
+    # Overrides REQUEST_BUDGET_SECONDS for this request
+    budget_seconds: Optional[float] = Field(default=None, gt=0)
 
 class DocumentResponse(BaseModel):
     answers: List[str]
+    # Budget, per-answer sources and which answers were degraded to meet it
+    metadata: Optional[Dict[str, Any]] = None
+
+class IngestRequest(BaseModel):
+    documents: str
 
 @router.post("/process-document", response_model=DocumentResponse)
 async def process_document(request: DocumentRequest):
     try:
-        print("📥 /process-document called")
-        ingest_document(request.documents)
-        print("📄 Document ingested")
-
-        answers = answer_questions(
-            document_url=request.documents,
-            questions=request.questions,
-            top_k=8
-        )
-        print("✅ Answers:", answers)
-
-        return DocumentResponse(answers=answers)
+        response = await _answer_within_budget(request)
+        logger.info("✅ /process-document answered %d questions", len(response.answers))
+
+        return response
     except Exception as e:
-        print("🔥 Error:", str(e))
+        logger.exception("🔥 Error in /process-document")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/hackrx/run", response_model=DocumentResponse)
@@ -45,30 +55,147 @@ async def run_hackrx_submission(
     request: DocumentRequest,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    print("🚀 /hackrx/run endpoint hit")
-    token = credentials.credentials
-    print("🔐 Token received:", token)
-    print("🔐 Expected token from env:", BEARER_TOKEN)
-
-    if token != BEARER_TOKEN:
-        print("❌ Token mismatch")
+    if credentials.credentials != BEARER_TOKEN:
+        logger.warning("❌ /hackrx/run rejected: invalid token")
         raise HTTPException(status_code=403, detail="Invalid token")
 
     try:
-        print("📥 Processing document:", request.documents)
-        ingest_document(request.documents)
-        print("📄 Document ingested")
-
-        print("❓ Answering questions:", request.questions)
-        answers = answer_questions(
-            document_url=request.documents,
-            questions=request.questions,
-            top_k=8
-        )
-        print("✅ Final answers:", answers)
+        response = await _answer_within_budget(request)
+        logger.info("✅ /hackrx/run answered %d questions", len(response.answers))
 
-        return DocumentResponse(answers=answers)
+        return response
 
     except Exception as e:
-        print("🔥 ERROR in /hackrx/run:", str(e))
+        logger.exception("🔥 Error in /hackrx/run")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _ingest_within(
+    request: DocumentRequest,
+    deadline: Deadline,
+    progress: Optional[ProgressCallback] = None,
+) -> Optional[str]:
+    """
+    Ingest within the request budget: the namespace to answer from (possibly
+    only text-indexed so far), or None if the document is not readable in time.
+    """
+    namespace, complete = await ingest_jobs.ingest_within(request.documents, deadline, progress=progress)
+    if namespace is None:
+        deadline.degrade("ingestion_timeout")
+    elif not complete:
+        deadline.degrade("partial_index")
+    return namespace
+
+
+async def _answers(
+    request: DocumentRequest,
+    namespace: Optional[str],
+    deadline: Deadline,
+) -> AsyncIterator[Tuple[int, str, str]]:
+    if namespace is None:
+        for i in range(len(request.questions)):
+            yield i, UNANSWERED, "unanswered"
+        return
+    async for item in stream_answers(
+        document_url=request.documents,
+        questions=request.questions,
+        top_k=8,
+        namespace=namespace,
+        deadline=deadline,
+    ):
+        yield item
+
+
+async def _answer_within_budget(request: DocumentRequest) -> DocumentResponse:
+    deadline = Deadline(request.budget_seconds)
+    namespace = await _ingest_within(request, deadline)
+    answers: List[Optional[str]] = [None] * len(request.questions)
+    sources: List[Optional[str]] = [None] * len(request.questions)
+    async for i, answer, source in _answers(request, namespace, deadline):
+        answers[i], sources[i] = answer, source
+    metadata = deadline.metadata(sources)
+    if metadata["degraded"]:
+        logger.info("⏱️ %d of %d answers degraded to meet the budget: %s",
+                    len(metadata["degraded"]), len(answers), ", ".join(deadline.degradations))
+    return DocumentResponse(answers=answers, metadata=metadata)
+
+
+def _check_token(credentials: HTTPAuthorizationCredentials) -> None:
+    if credentials.credentials != BEARER_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+
+@router.post("/ingest", status_code=202)
+async def submit_ingest(
+    request: IngestRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Queue a document for ingestion and return its job at once; a URL that is
+    already being ingested returns the existing job.
+    """
+    _check_token(credentials)
+    return ingest_jobs.submit(request.documents).as_dict()
+
+
+@router.get("/ingest/{job_id}")
+async def get_ingest_job(
+    job_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    _check_token(credentials)
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.as_dict()
+
+
+async def _hackrx_events(request: DocumentRequest) -> AsyncIterator[Dict]:
+    """
+    Events for /hackrx/run/stream: ingestion progress, then one answer per
+    question in completion order, then "done" with all answers in order and
+    the budget metadata.
+    """
+    deadline = Deadline(request.budget_seconds)
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_progress(stage: str, **details) -> None:
+        events.put_nowait({"event": "progress", "stage": stage, **details})
+
+    ingest = asyncio.ensure_future(_ingest_within(request, deadline, progress=on_progress))
+    ingest.add_done_callback(lambda _: events.put_nowait(None))
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        yield event
+
+    try:
+        namespace = ingest.result()
+        answers: List[Optional[str]] = [None] * len(request.questions)
+        sources: List[Optional[str]] = [None] * len(request.questions)
+        async for i, answer, source in _answers(request, namespace, deadline):
+            answers[i], sources[i] = answer, source
+            yield {"event": "answer", "index": i, "question": request.questions[i], "answer": answer, "source": source}
+        yield {"event": "done", "answers": answers, "metadata": deadline.metadata(sources)}
+    except Exception as e:
+        logger.exception("🔥 Error in /hackrx/run/stream")
+        yield {"event": "error", "detail": str(e)}
+
+
+async def _ndjson(events: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    async for event in events:
+        yield (json.dumps(event) + "\n").encode("utf-8")
+
+
+@router.post("/hackrx/run/stream")
+async def run_hackrx_stream(
+    request: DocumentRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Streaming /hackrx/run: newline-delimited JSON events, one per line, so
+    clients can use each answer as soon as it is ready.
+    """
+    _check_token(credentials)
+    return StreamingResponse(_ndjson(_hackrx_events(request)), media_type="application/x-ndjson")
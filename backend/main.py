@@ -6,10 +6,11 @@ import logging
 
 # Load environment variables
 load_dotenv()
-print("ENV token loaded:", os.getenv("BEARER_TOKEN"))
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
+if not os.getenv("BEARER_TOKEN"):
+    logging.getLogger(__name__).warning("BEARER_TOKEN is not set; authenticated routes will reject every request")
 
 # FastAPI instance
 app = FastAPI(
@@ -30,7 +31,10 @@ app.add_middleware(
 # Routers
 from backend.app.routes import router as pipeline_router  # /api/v1/*
 from backend.routes.qa_routes import router as qa_router  # /api/v1/qa/*
+from backend.app.health import router as health_router, track_requests  # /healthz, /readyz, /metrics
 
 # Register routes
 app.include_router(pipeline_router, prefix="/api/v1", tags=["Pipeline"])
 app.include_router(qa_router, prefix="/api/v1/qa", tags=["QuestionAnswering"])
+app.include_router(health_router, tags=["Health"])
+app.middleware("http")(track_requests)
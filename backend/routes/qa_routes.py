@@ -14,6 +14,7 @@ class SearchRequest(BaseModel):
     top_k: int = 5
     namespace: str = "default"
     fltr: Optional[Dict] = None
+    mode: str = "dense"  # "dense" | "sparse" | "hybrid"
 
 class SearchResponse(BaseModel):
     chunks: List[Dict]
@@ -35,6 +36,7 @@ def search_endpoint(request: SearchRequest):
         top_k=request.top_k,
         namespace=request.namespace,
         fltr=request.fltr,
+        mode=request.mode,
     )
     return {"chunks": results}
 
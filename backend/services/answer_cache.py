@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backend.services.storage import data_path
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_MAX_ITEMS = int(os.getenv("ANSWER_CACHE_MAX_ITEMS", "10000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+# Optional SQLite persistence shared by workers ("0" keeps the cache in memory only)
+ANSWER_CACHE_PERSIST = os.getenv("ANSWER_CACHE_PERSIST", "1") != "0"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH") or data_path("answers.sqlite3")
+
+_SQL_CHUNK = 500  # stay well under SQLite's bound-parameter limit
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Case-, whitespace- and trailing-punctuation-insensitive form of a question.
+    """
+    return _WS_RE.sub(" ", question.lower()).strip().rstrip("?.!; ").strip()
+
+
+def answer_key(doc_hash: str, question: str, prompt_version: str, model: str) -> str:
+    raw = "\x1f".join((doc_hash, normalize_question(question), prompt_version, model))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    LRU + TTL cache of final answers, optionally persisted to SQLite.
+    Keys come from answer_key(); values are answer strings.
+    """
+
+    def __init__(self, max_items: int = ANSWER_CACHE_MAX_ITEMS, ttl: float = ANSWER_CACHE_TTL, db_path: Optional[str] = None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.db_path = db_path
+        self._mem: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.db_path is None:
+            return None
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                conn.execute("DELETE FROM answers WHERE expires_at < ?", (time.time(),))
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning("Answer cache persistence unavailable (%s); using memory only", e)
+                self.db_path = None
+                return None
+        return self._conn
+
+    def _remember(self, key: str, answer: str, expires_at: float) -> None:
+        # caller holds self._lock
+        self._mem[key] = (answer, expires_at)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        now = time.time()
+        out: List[Optional[str]] = [None] * len(keys)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._mem.get(key)
+                if entry is not None and entry[1] > now:
+                    self._mem.move_to_end(key)
+                    out[i] = entry[0]
+                else:
+                    if entry is not None:
+                        del self._mem[key]
+                    missing.setdefault(key, []).append(i)
+
+            conn = self._db() if missing else None
+            if conn is not None:
+                pending = list(missing)
+                for start in range(0, len(pending), _SQL_CHUNK):
+                    part = pending[start : start + _SQL_CHUNK]
+                    marks = ",".join("?" * len(part))
+                    try:
+                        rows = conn.execute(
+                            f"SELECT key, answer, expires_at FROM answers WHERE expires_at > ? AND key IN ({marks})",
+                            (now, *part),
+                        ).fetchall()
+                    except sqlite3.Error as e:
+                        logger.warning("Answer cache read failed: %s", e)
+                        break
+                    for key, answer, expires_at in rows:
+                        self._remember(key, answer, expires_at)
+                        for i in missing.pop(key):
+                            out[i] = answer
+
+            self.hits += sum(1 for a in out if a is not None)
+            self.misses += sum(len(v) for v in missing.values())
+        return out
+
+    def put_many(self, items: Sequence[Tuple[str, str]]) -> None:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for key, answer in items:
+                self._remember(key, answer, expires_at)
+            conn = self._db()
+            if conn is None or not items:
+                return
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO answers (key, answer, expires_at) VALUES (?, ?, ?)",
+                    [(key, answer, expires_at) for key, answer in items],
+                )
+            except sqlite3.Error as e:
+                logger.warning("Answer cache write failed: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "items": len(self._mem),
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+answer_cache = AnswerCache(db_path=ANSWER_CACHE_PATH if ANSWER_CACHE_PERSIST else None)
@@ -0,0 +1,31 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Bounded pools for blocking work so async endpoints never run it on the event loop.
+# I/O pool: HTTP downloads, Gemini, Pinecone. CPU pool: parsing and other pure-Python work.
+IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 2)))
+
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+_cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking I/O call on the shared I/O pool and await its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_cpu(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run CPU-bound work off the event loop on the shared CPU pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cpu_executor, functools.partial(func, *args, **kwargs))
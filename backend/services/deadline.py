@@ -0,0 +1,75 @@
+import os
+import time
+import logging
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Latency budget for one request, end to end; requests may override it up to the max
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "25"))
+MAX_REQUEST_BUDGET_SECONDS = float(os.getenv("MAX_REQUEST_BUDGET_SECONDS", "300"))
+# Always kept back for the heuristic answerer, which needs no network calls
+FALLBACK_RESERVE_SECONDS = float(os.getenv("FALLBACK_RESERVE_SECONDS", "1"))
+# An LLM call is not started with less than this left on top of the fallback reserve
+LLM_MIN_SECONDS = float(os.getenv("LLM_MIN_SECONDS", "4"))
+# Kept back after ingestion for question embedding and retrieval
+RETRIEVAL_RESERVE_SECONDS = float(os.getenv("RETRIEVAL_RESERVE_SECONDS", "1"))
+
+# Degradations that change what retrieval saw, so every later answer is affected
+RETRIEVAL_DEGRADATIONS = ("partial_index", "sparse_retrieval", "reduced_top_k")
+
+
+class Deadline:
+    """
+    A request's latency budget, passed down through ingestion, retrieval and
+    generation. Each stage asks how much time it may use and degrades to fit;
+    what was given up is recorded for the response metadata.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        budget = REQUEST_BUDGET_SECONDS if seconds is None else seconds
+        self.budget = max(0.0, min(budget, MAX_REQUEST_BUDGET_SECONDS))
+        self.started = time.monotonic()
+        self.expires = self.started + self.budget
+        self.degradations: List[str] = []
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def available(self, reserve: float = FALLBACK_RESERVE_SECONDS) -> float:
+        """Time a stage may use while leaving `reserve` for the stages after it."""
+        return max(0.0, self.remaining() - reserve)
+
+    def llm_time(self) -> float:
+        """Time an LLM call may take, or 0 if there is too little left to start one."""
+        available = self.available()
+        return available if available >= LLM_MIN_SECONDS else 0.0
+
+    def degrade(self, reason: str) -> None:
+        if reason not in self.degradations:
+            self.degradations.append(reason)
+            logger.info("⏱️ Degrading to meet a %.1fs budget (%.1fs left): %s", self.budget, self.remaining(), reason)
+
+    @property
+    def retrieval_degraded(self) -> bool:
+        return any(r in self.degradations for r in RETRIEVAL_DEGRADATIONS)
+
+    def metadata(self, sources: Sequence[Optional[str]]) -> Dict:
+        """
+        Response metadata: per-answer sources, and the answers that are degraded
+        (heuristic, unanswered, or generated from degraded retrieval).
+        """
+        degraded = [
+            i for i, source in enumerate(sources)
+            if source in ("fallback", "unanswered") or (source == "llm" and self.retrieval_degraded)
+        ]
+        return {
+            "budget_seconds": self.budget,
+            "elapsed_seconds": round(self.elapsed(), 3),
+            "sources": list(sources),
+            "degraded": degraded,
+            "degradations": list(self.degradations),
+        }
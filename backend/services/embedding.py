@@ -1,132 +1,321 @@
 import os
-import hashlib
 import time
+import random
+import asyncio
 import logging
-from typing import List
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from backend.services.embedding_cache import embedding_cache, text_key
+from backend.services.concurrency import run_io
+from backend.services import manifest
+from backend.services.metrics import EMBED_BATCH_SIZE, EMBED_CONCURRENCY_LIMIT, GEMINI_RETRIES, span
+from backend.services.rate_limit import AdaptiveLimiter, TokenBucket
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_EMBD_KEY")
-if not GEMINI_API_KEY:
-    raise RuntimeError("Missing GEMINI_EMBD_KEY in .env")
 
 MODEL = "models/embedding-001"
-BATCH_EMBED_URL = f"https://generativelanguage.googleapis.com/v1/{MODEL}:batchEmbedContents"
-
-# Simple in-memory cache
-_embedding_cache: dict[str, List[float]] = {}
+DEFAULT_DIMENSION = 1536  # reasonable fallback for many Gemini embedding variants
+# Overridable so benchmarks can point at a local stand-in (see benchmarks/)
+BATCH_EMBED_URL = os.getenv("GEMINI_EMBED_URL") or f"https://generativelanguage.googleapis.com/v1/{MODEL}:batchEmbedContents"
 
 MAX_BATCH_SIZE = 250  # Gemini API limit
 
+# Client-side limits for the embedding API, tuned to the project's quota
+EMBED_RPM = float(os.getenv("GEMINI_EMBED_RPM", "1500"))  # requests per minute; 0 = unlimited
+EMBED_BURST = float(os.getenv("GEMINI_EMBED_BURST", "10"))
+EMBED_CONCURRENCY = int(os.getenv("GEMINI_EMBED_CONCURRENCY", "8"))
+EMBED_MAX_RETRIES = int(os.getenv("GEMINI_EMBED_MAX_RETRIES", "5"))
+EMBED_MAX_BACKOFF = float(os.getenv("GEMINI_EMBED_MAX_BACKOFF", "30"))
+
+THROTTLE_STATUSES = (429, 503)
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
 
-def _call_gemini_batch_api(
-    texts: List[str], max_retries: int = 3, delay_base: float = 1.0
-) -> List[List[float]]:
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    """
+    Server-requested delay: the Retry-After header (seconds or HTTP date), or
+    the retryDelay of a google.rpc.RetryInfo detail in the error body.
+    """
+    header = resp.headers.get("Retry-After")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    try:
+        details = resp.json().get("error", {}).get("details", [])
+    except ValueError:
+        return None
+    for detail in details if isinstance(details, list) else []:
+        delay = isinstance(detail, dict) and detail.get("retryDelay")
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return max(0.0, float(delay[:-1]))
+            except ValueError:
+                pass
+    return None
+
+
+def _parse_embeddings(data: Dict) -> List[List[float]]:
     """
-    Call Gemini batch embedding API for a list of texts.
     Handles both wrapped and raw embedding formats.
     """
-    headers = {"Content-Type": "application/json"}
-    params = {"key": GEMINI_API_KEY}
-    payload = {
-        "requests": [
-            {"model": MODEL, "content": {"parts": [{"text": t}]}}
-            for t in texts
-        ]
-    }
+    embeddings_list: List[List[float]] = []
+    for item in data.get("embeddings", []):
+        if isinstance(item, dict):
+            if "embedding" in item and "values" in item["embedding"]:
+                embeddings_list.append(item["embedding"]["values"])
+            elif "values" in item:
+                embeddings_list.append(item["values"])
+            else:
+                logger.error("Unexpected embedding dict format: %s", item)
+                raise RuntimeError("Invalid embedding response format.")
+        elif isinstance(item, list):
+            embeddings_list.append(item)
+        else:
+            logger.error("Unexpected embedding type: %s", type(item))
+            raise RuntimeError("Invalid embedding response format.")
+    return embeddings_list
 
-    for attempt in range(1, max_retries + 1):
-        try:
-            resp = requests.post(
-                BATCH_EMBED_URL, headers=headers, params=params, json=payload, timeout=60
-            )
-            if resp.status_code == 200:
-                data = resp.json()
-                embeddings_raw = data.get("embeddings", [])
-
-                embeddings_list: List[List[float]] = []
-                for idx, item in enumerate(embeddings_raw):
-                    if isinstance(item, dict):
-                        if "embedding" in item and "values" in item["embedding"]:
-                            embeddings_list.append(item["embedding"]["values"])
-                        elif "values" in item:
-                            embeddings_list.append(item["values"])
-                        else:
-                            logger.error("Unexpected embedding dict format: %s", item)
-                            raise RuntimeError("Invalid embedding response format.")
-                    elif isinstance(item, list):
-                        embeddings_list.append(item)
-                    else:
-                        logger.error("Unexpected embedding type: %s", type(item))
-                        raise RuntimeError("Invalid embedding response format.")
-
-                return embeddings_list
-
-            elif resp.status_code in (429, 502, 503, 504) and attempt < max_retries:
-                backoff = delay_base * (2 ** (attempt - 1))
-                logger.warning("Transient Gemini error %s. Retrying in %.1f sec",
-                               resp.status_code, backoff)
+
+class GeminiEmbeddingClient:
+    """
+    Shared client for batchEmbedContents. Every call in the process goes through
+    one keep-alive session, one token bucket (requests per minute) and one
+    adaptive concurrency limit that halves on 429/503 and recovers additively.
+    Retries wait for Retry-After when the server sends one, otherwise for a
+    jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        url: str = BATCH_EMBED_URL,
+        rpm: float = EMBED_RPM,
+        burst: float = EMBED_BURST,
+        concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        max_backoff: float = EMBED_MAX_BACKOFF,
+    ):
+        self.url = url
+        self.max_retries = max(1, max_retries)
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate=rpm / 60.0, burst=burst)
+        self.limiter = AdaptiveLimiter(maximum=concurrency, on_change=EMBED_CONCURRENCY_LIMIT.set)
+        EMBED_CONCURRENCY_LIMIT.set(self.limiter.limit)
+        self.throttled = 0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(32, concurrency))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt: int, resp: Optional[requests.Response] = None) -> float:
+        delay = _retry_after(resp) if resp is not None else None
+        if delay is None:
+            delay = random.uniform(0.5, 1.0) * (2 ** (attempt - 1))
+        return min(delay, self.max_backoff)
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed up to MAX_BATCH_SIZE texts in one request.
+        """
+        if not GEMINI_API_KEY:
+            raise RuntimeError("Missing GEMINI_EMBD_KEY in .env")
+        params = {"key": GEMINI_API_KEY}
+        payload = {
+            "requests": [
+                {"model": MODEL, "content": {"parts": [{"text": t}]}}
+                for t in texts
+            ]
+        }
+
+        EMBED_BATCH_SIZE.observe(len(texts))
+        for attempt in range(1, self.max_retries + 1):
+            last = attempt == self.max_retries
+            with span("embed_wait"):
+                self.bucket.acquire()
+            try:
+                with self.limiter.slot(), span("embed"):
+                    resp = self.session.post(self.url, params=params, json=payload, timeout=60)
+            except requests.RequestException as e:
+                if last:
+                    raise RuntimeError(f"Failed to call Gemini embedding API: {e}") from e
+                backoff = self._backoff(attempt)
+                GEMINI_RETRIES.inc(api="embed", reason="network")
+                logger.warning("Network error on Gemini API call: %s; retrying in %.1f sec", e, backoff)
                 time.sleep(backoff)
                 continue
-            else:
-                logger.error("Gemini API error %s: %s", resp.status_code, resp.text)
+
+            if resp.status_code == 200:
+                self.limiter.on_success()
+                return _parse_embeddings(resp.json())
+            if resp.status_code in THROTTLE_STATUSES:
+                self.throttled += 1
+                self.limiter.on_throttle()
+            if resp.status_code not in TRANSIENT_STATUSES or last:
+                logger.error("Gemini API error %s: %s", resp.status_code, resp.text[:500])
                 resp.raise_for_status()
-        except requests.RequestException as e:
-            if attempt < max_retries:
-                backoff = delay_base * (2 ** (attempt - 1))
-                logger.warning("Network error on Gemini API call: %s; retrying in %.1f sec",
-                               e, backoff)
-                time.sleep(backoff)
-                continue
-            raise RuntimeError(f"Failed to call Gemini embedding API: {e}") from e
+            backoff = self._backoff(attempt, resp)
+            if resp.status_code in THROTTLE_STATUSES:
+                self.bucket.pause(backoff)  # everyone waits out the quota window, not just this call
+            GEMINI_RETRIES.inc(api="embed", reason=str(resp.status_code))
+            logger.warning("Transient Gemini error %s. Retrying in %.1f sec (concurrency limit %d)",
+                           resp.status_code, backoff, int(self.limiter.limit))
+            time.sleep(backoff)
 
-    raise RuntimeError("Exceeded retries calling Gemini embedding API.")
+        raise RuntimeError("Exceeded retries calling Gemini embedding API.")
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "concurrency_limit": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+            "throttled": self.throttled,
+        }
+
+
+embedding_client = GeminiEmbeddingClient()
+
+
+def _call_gemini_batch_api(texts: List[str]) -> List[List[float]]:
+    """
+    Call Gemini batch embedding API for a list of texts.
+    """
+    return embedding_client.embed_batch(texts)
 
 
 def get_embedding(text: str) -> List[float]:
     """
     Get a single embedding (with caching) by calling the batch API for one text.
     """
-    key = hashlib.md5(text.encode("utf-8")).hexdigest()
-    if key in _embedding_cache:
-        return _embedding_cache[key]
+    return get_embeddings([text])[0]
 
-    embedding = get_embeddings([text])[0]
-    _embedding_cache[key] = embedding
-    return embedding
+
+def _from_cache(texts: List[str]) -> Tuple[List[Optional[np.ndarray]], Dict[str, List[int]], List[str]]:
+    """
+    Split texts into cached float32 rows and the distinct keys still to fetch.
+    """
+    keys = [text_key(text) for text in texts]
+    cached = embedding_cache.get_many(MODEL, keys)
+    results = list(cached)  # None = miss
+
+    fetch_indices: Dict[str, List[int]] = {}
+    for idx, vec in enumerate(cached):
+        if vec is None:
+            fetch_indices.setdefault(keys[idx], []).append(idx)
+    return results, fetch_indices, list(fetch_indices)
+
+
+def _fill(
+    results: List[Optional[np.ndarray]],
+    fetch_indices: Dict[str, List[int]],
+    batch_keys: List[str],
+    batch_embeddings: List[List[float]],
+) -> None:
+    rows = np.asarray(batch_embeddings, dtype=np.float32)
+    embedding_cache.put_many(MODEL, batch_keys, rows)
+    for key, emb in zip(batch_keys, rows):
+        for orig_idx in fetch_indices[key]:
+            results[orig_idx] = emb
+
+
+def get_embedding_matrix(texts: List[str]) -> np.ndarray:
+    """
+    Get embeddings for a list of texts using batching and caching, as one
+    float32 (len(texts), dim) array: a quarter of the memory of nested lists,
+    for callers that hold many embeddings at once (ingestion).
+    """
+    results, fetch_indices, to_fetch = _from_cache(texts)
+
+    # Call API in batches for missing items
+    for i in range(0, len(to_fetch), MAX_BATCH_SIZE):
+        batch_keys = to_fetch[i: i + MAX_BATCH_SIZE]
+        batch = [texts[fetch_indices[k][0]] for k in batch_keys]
+        _fill(results, fetch_indices, batch_keys, _call_gemini_batch_api(batch))
+
+    if any(row is None for row in results):
+        raise RuntimeError("Gemini embedding API returned fewer embeddings than texts.")
+    return np.stack(results) if results else np.zeros((0, 0), dtype=np.float32)
 
 
 def get_embeddings(texts: List[str]) -> List[List[float]]:
     """
     Get embeddings for a list of texts using batching and caching.
     """
-    results: List[List[float]] = []
-    to_fetch: List[str] = []
-    fetch_indices: List[int] = []
+    return get_embedding_matrix(texts).tolist()
 
-    # Pull from cache
-    for idx, text in enumerate(texts):
-        key = hashlib.md5(text.encode("utf-8")).hexdigest()
-        if key in _embedding_cache:
-            results.append(_embedding_cache[key])
-        else:
-            results.append(None)  # placeholder
-            to_fetch.append(text)
-            fetch_indices.append(idx)
 
-    # Call API in batches for missing items
-    for i in range(0, len(to_fetch), MAX_BATCH_SIZE):
-        batch = to_fetch[i: i + MAX_BATCH_SIZE]
-        batch_embeddings = _call_gemini_batch_api(batch)
-        for j, emb in enumerate(batch_embeddings):
-            orig_idx = fetch_indices[i + j]
-            key = hashlib.md5(texts[orig_idx].encode("utf-8")).hexdigest()
-            _embedding_cache[key] = emb
-            results[orig_idx] = emb
+async def aget_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Async get_embeddings: missing batches are fetched concurrently on the I/O pool.
+    """
+    results, fetch_indices, to_fetch = _from_cache(texts)
+    batches = [to_fetch[i: i + MAX_BATCH_SIZE] for i in range(0, len(to_fetch), MAX_BATCH_SIZE)]
+    fetched = await asyncio.gather(*[
+        run_io(_call_gemini_batch_api, [texts[fetch_indices[k][0]] for k in batch_keys])
+        for batch_keys in batches
+    ])
+    for batch_keys, batch_embeddings in zip(batches, fetched):
+        _fill(results, fetch_indices, batch_keys, batch_embeddings)
+    if any(row is None for row in results):
+        raise RuntimeError("Gemini embedding API returned fewer embeddings than texts.")
+    return [row.tolist() for row in results]
+
+
+def _detect_embedding_dimension(sample_text: str = "dimension check", timeout_sec: float = 5.0) -> Optional[int]:
+    """
+    Attempts to get a single embedding to determine its dimension, with a timeout.
+    Returns None if detection fails.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(get_embedding, sample_text)
+        try:
+            emb = future.result(timeout=timeout_sec)
+            if not isinstance(emb, list):
+                raise ValueError("Embedding not a list")
+            dim = len(emb)
+            logger.info("Detected Gemini embedding dimension: %s", dim)
+            return dim
+        except TimeoutError:
+            logger.warning("Timeout while detecting embedding dimension")
+        except Exception as e:
+            logger.warning("Error detecting embedding dimension (%s)", e)
+    return None
+
+
+_dimension: Optional[int] = None
+
 
-    return results
+def get_embedding_dimension() -> int:
+    """
+    Embedding dimension for MODEL. Resolved once per process, in order:
+    EMBEDDING_DIMENSION env, the value persisted in the manifest, a live
+    detection call (persisted on success), then DEFAULT_DIMENSION.
+    """
+    global _dimension
+    if _dimension is None:
+        setting_key = f"embedding_dimension:{MODEL}"
+        configured = os.getenv("EMBEDDING_DIMENSION") or manifest.get_setting(setting_key)
+        if configured:
+            _dimension = int(configured)
+        else:
+            detected = _detect_embedding_dimension()
+            if detected is not None:
+                manifest.set_setting(setting_key, str(detected))
+                _dimension = detected
+            else:
+                logger.warning("Falling back to default embedding dimension=%s", DEFAULT_DIMENSION)
+                _dimension = DEFAULT_DIMENSION
+    return _dimension
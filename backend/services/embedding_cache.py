@@ -0,0 +1,175 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.services.storage import data_path
+from backend.services.vector_codec import CODECS, from_blob, to_blob
+
+logger = logging.getLogger(__name__)
+
+# In-memory tier: bounded LRU of encoded rows
+EMBED_CACHE_MAX_ITEMS = int(os.getenv("EMBED_CACHE_MAX_ITEMS", "20000"))
+# On-disk tier: SQLite file shared by all workers and kept across restarts ("0" disables)
+EMBED_CACHE_DISK = os.getenv("EMBED_CACHE_DISK", "1") != "0"
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH") or data_path("embeddings.sqlite3")
+# Encoding of cached rows in both tiers. Cached embeddings are upserted again on
+# re-ingestion, so the default float16 stays near-lossless (int8 is 4x smaller than float32)
+EMBED_CACHE_CODEC = os.getenv("EMBED_CACHE_CODEC", "float16").lower()
+
+_SQL_CHUNK = 500  # stay well under SQLite's bound-parameter limit
+
+
+def text_key(text: str) -> str:
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, text hash).
+    Both tiers hold rows encoded with `codec` (see vector_codec): the memory tier
+    is an LRU of blobs, the disk tier a SQLite table of the same blobs.
+    Lookups decode to float32.
+    """
+
+    def __init__(
+        self,
+        max_items: int = EMBED_CACHE_MAX_ITEMS,
+        db_path: Optional[str] = None,
+        codec: str = EMBED_CACHE_CODEC,
+    ):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown EMBED_CACHE_CODEC: {codec}")
+        self.max_items = max_items
+        self.db_path = db_path
+        self.codec = codec
+        self._mem: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.db_path is None:
+            return None
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(
+                    self.db_path, timeout=30, isolation_level=None, check_same_thread=False
+                )
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        model TEXT NOT NULL,
+                        key   TEXT NOT NULL,
+                        dim   INTEGER NOT NULL,
+                        vec   BLOB NOT NULL,
+                        codec TEXT NOT NULL DEFAULT 'float32',
+                        PRIMARY KEY (model, key)
+                    ) WITHOUT ROWID
+                    """
+                )
+                if "codec" not in {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}:
+                    # caches written before encoded rows hold float32 blobs
+                    conn.execute("ALTER TABLE embeddings ADD COLUMN codec TEXT NOT NULL DEFAULT 'float32'")
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning("Embedding disk cache unavailable (%s); using memory only", e)
+                self.db_path = None
+                return None
+        return self._conn
+
+    def _remember(self, k: Tuple[str, str], blob: bytes) -> None:
+        # caller holds self._lock
+        self._mem[k] = blob
+        self._mem.move_to_end(k)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, model: str, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up many keys at once; returns float32 rows or None per key.
+        """
+        out: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                blob = self._mem.get((model, key))
+                if blob is not None:
+                    self._mem.move_to_end((model, key))
+                    out[i] = from_blob(blob, self.codec)
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            conn = self._db() if missing else None
+            if conn is not None:
+                pending = list(missing)
+                for start in range(0, len(pending), _SQL_CHUNK):
+                    part = pending[start : start + _SQL_CHUNK]
+                    marks = ",".join("?" * len(part))
+                    try:
+                        rows = conn.execute(
+                            f"SELECT key, vec, codec FROM embeddings WHERE model = ? AND key IN ({marks})",
+                            (model, *part),
+                        ).fetchall()
+                    except sqlite3.Error as e:
+                        logger.warning("Embedding disk cache read failed: %s", e)
+                        break
+                    for key, blob, codec in rows:
+                        vec = from_blob(blob, codec)
+                        self._remember((model, key), blob if codec == self.codec else to_blob(vec, self.codec))
+                        for i in missing.pop(key):
+                            out[i] = vec
+                            self.disk_hits += 1
+
+            self.misses += sum(len(v) for v in missing.values())
+        return out
+
+    def put_many(self, model: str, keys: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        Store rows of a 2-D array under the given keys in both tiers.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        blobs = [to_blob(row, self.codec) for row in vectors]
+        with self._lock:
+            for key, blob in zip(keys, blobs):
+                self._remember((model, key), blob)
+            conn = self._db()
+            if conn is None:
+                return
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, key, dim, vec, codec) VALUES (?, ?, ?, ?, ?)",
+                    [(model, key, vectors.shape[1], blob, self.codec) for key, blob in zip(keys, blobs)],
+                )
+            except sqlite3.Error as e:
+                logger.warning("Embedding disk cache write failed: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "items": len(self._mem),
+                "max_items": self.max_items,
+                "bytes": sum(len(blob) for blob in self._mem.values()),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+embedding_cache = EmbeddingCache(
+    max_items=EMBED_CACHE_MAX_ITEMS,
+    db_path=EMBED_CACHE_PATH if EMBED_CACHE_DISK else None,
+)
@@ -0,0 +1,78 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from backend.services.storage import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Per-namespace text indexes built at ingestion live under INDEX_DIR/<namespace>/
+INDEX_DIR = os.getenv("TEXT_INDEX_DIR") or os.path.join(DATA_DIR, "indexes")
+
+T = TypeVar("T")
+
+
+def index_path(namespace: str, filename: str) -> str:
+    return os.path.join(INDEX_DIR, namespace, filename)
+
+
+def pack_strings(strings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Strings → (utf-8 byte blob, offsets) so they can live in an .npz without pickling."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = blob.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def save_npz(path: str, **arrays: np.ndarray) -> None:
+    """Write an .npz atomically so concurrent readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+class IndexCache(Generic[T]):
+    """
+    LRU of loaded per-namespace indexes, keyed by file mtime so a rebuilt
+    index is picked up without a restart.
+    """
+
+    def __init__(self, filename: str, loader: Callable[[str], T], max_items: int):
+        self.filename = filename
+        self.loader = loader
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple[str, int], T]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str) -> Optional[T]:
+        path = index_path(namespace, self.filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = (namespace, mtime)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                return item
+        try:
+            item = self.loader(path)
+        except Exception as e:
+            logger.warning("Could not load %s for namespace=%s: %s", self.filename, namespace, e)
+            return None
+        with self._lock:
+            self._items[key] = item
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return item
@@ -0,0 +1,191 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.services.deadline import FALLBACK_RESERVE_SECONDS, LLM_MIN_SECONDS, RETRIEVAL_RESERVE_SECONDS, Deadline
+from backend.services.ingestion import ProgressCallback, canonical_document, ingest_document_async
+
+logger = logging.getLogger(__name__)
+
+# Documents ingested at once; further jobs wait in the queue
+INGEST_WORKERS = max(1, int(os.getenv("INGEST_WORKERS", "2")))
+# Finished jobs kept for status polling
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "500"))
+
+
+@dataclass
+class IngestJob:
+    """One document ingestion, shared by every request for the same document while it runs."""
+    id: str
+    url: str
+    status: str = "queued"  # queued → running → succeeded | failed
+    stage: str = "queued"
+    details: Dict[str, Any] = field(default_factory=dict)
+    namespace: Optional[str] = None
+    searchable_namespace: Optional[str] = None  # text indexes ready, embeddings still running
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _events: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+    _listeners: List[ProgressCallback] = field(default_factory=list, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _searchable: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _exc: Optional[BaseException] = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "url": self.url,
+            "status": self.status,
+            "stage": self.stage,
+            "details": self.details,
+            "namespace": self.namespace,
+            "searchable_namespace": self.searchable_namespace,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def _progress(self, stage: str, **details) -> None:
+        self.stage, self.details = stage, details
+        self._events.append({"stage": stage, **details})
+        if stage == "searchable":
+            self.searchable_namespace = details.get("namespace")
+            self._searchable.set()
+        for listener in list(self._listeners):
+            try:
+                listener(stage, **details)
+            except Exception as e:
+                logger.warning("Ingestion progress listener failed: %s", e)
+
+
+class IngestJobManager:
+    """
+    In-process ingestion queue: at most `workers` documents are ingested at
+    once, and concurrent submissions of a document that is already queued or
+    running (by canonical URL, so re-signed links count as the same document)
+    join the existing job (single-flight) instead of starting another.
+    Jobs are asyncio tasks on the serving event loop; no broker needed.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, history: int = INGEST_JOB_HISTORY):
+        self.workers = workers
+        self.history = history
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._inflight: Dict[str, IngestJob] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (e.g. a script calling asyncio.run again): jobs from the old one are gone
+            self._loop, self._slots = loop, asyncio.Semaphore(self.workers)
+            self._inflight.clear()
+        return self._slots
+
+    def submit(self, url: str, progress: Optional[ProgressCallback] = None) -> IngestJob:
+        """
+        Queue ingestion of `url`, or join the job already in flight for it.
+        `progress` receives the job's progress events, past ones replayed first.
+        """
+        slots = self._semaphore()
+        key = canonical_document(url)
+        job = self._inflight.get(key)
+        if job is None:
+            job = IngestJob(id=uuid.uuid4().hex, url=url)
+            self._inflight[key] = job
+            self._jobs[job.id] = job
+            self._trim()
+            job._task = asyncio.create_task(self._run(job, slots))
+            logger.info("📥 Ingestion job %s queued for %s", job.id, url)
+        else:
+            logger.info("🔗 Joining ingestion job %s for %s", job.id, url)
+        if progress is not None:
+            for event in job._events:
+                details = {k: v for k, v in event.items() if k != "stage"}
+                progress(event["stage"], **details)
+            job._listeners.append(progress)
+        return job
+
+    async def _run(self, job: IngestJob, slots: asyncio.Semaphore) -> None:
+        try:
+            async with slots:
+                job.status, job.started_at = "running", time.time()
+                job._progress("started")
+                job.namespace = await ingest_document_async(job.url, progress=job._progress)
+            job.status = "succeeded"
+        except Exception as e:
+            job.status, job.error, job._exc = "failed", str(e), e
+            logger.warning("Ingestion job %s failed: %s", job.id, e)
+        finally:
+            job.finished_at = time.time()
+            job._listeners.clear()
+            key = canonical_document(job.url)
+            if self._inflight.get(key) is job:
+                del self._inflight[key]
+
+    def _trim(self) -> None:
+        excess = len(self._jobs) - self.history
+        for job_id in [jid for jid, job in self._jobs.items() if job.done][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: IngestJob) -> str:
+        """
+        Namespace of a finished job; re-raises its ingestion error.
+        Cancelling the waiter does not cancel the shared job.
+        """
+        if job._task is not None:
+            await asyncio.shield(job._task)
+        if job._exc is not None:
+            raise job._exc
+        return job.namespace
+
+    async def ingest_within(
+        self,
+        url: str,
+        deadline: Deadline,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Tuple[Optional[str], bool]:
+        """
+        submit() and wait() bounded by a request deadline. Returns (namespace, complete):
+        the finished namespace if ingestion ends while leaving time for retrieval
+        and an LLM answer; otherwise, once the fallback reserve is all that is left, the
+        namespace whose text indexes are ready (sparse search only), or None.
+        The job keeps running for later requests either way.
+        """
+        job = self.submit(url, progress=progress)
+        waiter = asyncio.ensure_future(self.wait(job))
+        try:
+            answer_reserve = FALLBACK_RESERVE_SECONDS + LLM_MIN_SECONDS + RETRIEVAL_RESERVE_SECONDS
+            await asyncio.wait({waiter}, timeout=deadline.available(answer_reserve))
+            if not waiter.done() and job.searchable_namespace is None:
+                searchable = asyncio.ensure_future(job._searchable.wait())
+                try:
+                    await asyncio.wait(
+                        {waiter, searchable}, timeout=deadline.available(), return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    searchable.cancel()
+            if waiter.done():
+                return waiter.result(), True
+            return job.searchable_namespace, False
+        finally:
+            waiter.cancel()
+
+
+ingest_jobs = IngestJobManager()
@@ -0,0 +1,160 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.services.embedding import MAX_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Chunks per embedding request (capped by the Gemini batch limit)
+EMBED_BATCH_SIZE = min(int(os.getenv("EMBED_BATCH_SIZE", str(MAX_BATCH_SIZE))), MAX_BATCH_SIZE)
+# Embedding requests allowed in flight at once per ingestion
+EMBED_CONCURRENCY = max(1, int(os.getenv("EMBED_CONCURRENCY", "4")))
+# Vectors per upsert request
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+
+
+@dataclass
+class _StageClock:
+    """Wall-clock span of a stage across all its workers, plus summed busy time."""
+    first_start: Optional[float] = None
+    last_end: Optional[float] = None
+    busy: float = 0.0
+    items: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, start: float, end: float, items: int) -> None:
+        with self._lock:
+            self.first_start = start if self.first_start is None else min(self.first_start, start)
+            self.last_end = end if self.last_end is None else max(self.last_end, end)
+            self.busy += end - start
+            self.items += items
+
+    @property
+    def wall(self) -> float:
+        if self.first_start is None or self.last_end is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.wall if self.wall > 0 else 0.0
+
+
+@dataclass
+class PipelineStats:
+    chunks: int = 0
+    vectors: int = 0
+    skipped: int = 0
+    wall_seconds: float = 0.0
+    embed: _StageClock = field(default_factory=_StageClock)
+    upsert: _StageClock = field(default_factory=_StageClock)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "chunks": self.chunks,
+            "vectors": self.vectors,
+            "skipped": self.skipped,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "embed_seconds": round(self.embed.wall, 3),
+            "embed_chunks_per_sec": round(self.embed.throughput, 1),
+            "upsert_seconds": round(self.upsert.wall, 3),
+            "upsert_chunks_per_sec": round(self.upsert.throughput, 1),
+            "overall_chunks_per_sec": round(self.vectors / self.wall_seconds, 1) if self.wall_seconds else 0.0,
+        }
+
+
+# (vector id, text, metadata)
+Record = Tuple[str, str, Dict]
+
+
+def run_embed_upsert_pipeline(
+    records: List[Record],
+    embed_fn: Callable[[List[str]], Sequence],
+    upsert_fn: Callable[[List[Dict]], None],
+    dimension: Optional[int] = None,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    concurrency: int = EMBED_CONCURRENCY,
+    upsert_batch_size: int = UPSERT_BATCH_SIZE,
+) -> PipelineStats:
+    """
+    Embed records in full-size batches, several batches concurrently, and upsert
+    finished batches on a separate thread so upserts overlap the next embeddings.
+    Embedding results are consumed in submission order, so upserts keep chunk order.
+    `embed_fn` returns one row per text, as lists or a float32 array; array rows
+    are passed on as vector values without conversion to lists.
+    """
+    stats = PipelineStats(chunks=len(records))
+    started = time.perf_counter()
+
+    def _embed(batch: List[Record]) -> Sequence:
+        t0 = time.perf_counter()
+        embeddings = embed_fn([text for _, text, _ in batch])
+        stats.embed.record(t0, time.perf_counter(), len(batch))
+        return embeddings
+
+    def _upsert(vectors: List[Dict]) -> None:
+        t0 = time.perf_counter()
+        upsert_fn(vectors)
+        stats.upsert.record(t0, time.perf_counter(), len(vectors))
+
+    batches = [records[i : i + embed_batch_size] for i in range(0, len(records), embed_batch_size)]
+    pending: Deque[Tuple[List[Record], Future]] = deque()
+    upserts: List[Future] = []
+    next_batch = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as embed_pool, \
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="upsert") as upsert_pool:
+        try:
+            while next_batch < len(batches) or pending:
+                # Keep the embed pool saturated without queueing the whole document
+                while next_batch < len(batches) and len(pending) < concurrency:
+                    batch = batches[next_batch]
+                    pending.append((batch, embed_pool.submit(_embed, batch)))
+                    next_batch += 1
+
+                batch, fut = pending.popleft()
+                embeddings = fut.result()
+                vectors = []
+                for (vector_id, _, metadata), embedding in zip(batch, embeddings):
+                    if not isinstance(embedding, (list, np.ndarray)):
+                        logger.warning("Embedding for chunk %s not a vector; skipping", vector_id)
+                        stats.skipped += 1
+                        continue
+                    if dimension is not None and len(embedding) != dimension:
+                        logger.warning(
+                            "Embedding dim %s mismatches expected %s for chunk %s; skipping",
+                            len(embedding),
+                            dimension,
+                            vector_id,
+                        )
+                        stats.skipped += 1
+                        continue
+                    vectors.append({"id": vector_id, "values": embedding, "metadata": metadata})
+
+                for i in range(0, len(vectors), upsert_batch_size):
+                    upserts.append(upsert_pool.submit(_upsert, vectors[i : i + upsert_batch_size]))
+                stats.vectors += len(vectors)
+
+                # Surface upsert failures early instead of embedding the rest for nothing
+                for done in [u for u in upserts if u.done()]:
+                    done.result()
+        except BaseException:
+            for _, fut in pending:
+                fut.cancel()
+            for u in upserts:
+                u.cancel()
+            raise
+
+        for u in upserts:
+            u.result()
+
+    stats.wall_seconds = time.perf_counter() - started
+    return stats
@@ -0,0 +1,306 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+import weakref
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from backend.services.embedding import get_embedding_matrix, get_embedding_dimension, MODEL as EMBED_MODEL
+from backend.services.ingest_pipeline import run_embed_upsert_pipeline
+from backend.services.text_chunker import iter_chunks
+from backend.services.vector_store import get_vector_store
+from backend.services.sentence_index import SentenceIndex, save_sentence_index
+from backend.services.sparse_index import BM25Index, save_sparse_index
+from backend.services import manifest
+from backend.services.concurrency import run_io, run_cpu
+from backend.services.metrics import span
+from backend.app.document_parser import DownloadedDocument, open_document, extract_pages
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Query parameters that only sign or expire a link (Azure SAS, S3/GCS presigned
+# URLs, CloudFront); every other parameter may select a different document
+_SIGNING_PARAMS = frozenset({
+    "sig", "se", "st", "sp", "sv", "sr", "ss", "srt", "spr", "si", "sdd",
+    "skoid", "sktid", "skt", "ske", "sks", "skv",
+    "expires", "signature", "key-pair-id", "policy",
+})
+_SIGNING_PREFIXES = ("x-amz-", "x-goog-")
+
+
+def _is_signing_param(name: str) -> bool:
+    name = name.lower()
+    return name in _SIGNING_PARAMS or name.startswith(_SIGNING_PREFIXES)
+
+
+def canonical_document(document_url: str) -> str:
+    """
+    Identity of a document across versions and re-signed links: for URLs the
+    scheme, host, path and query without signing parameters (fragment dropped);
+    the absolute path for files.
+    """
+    if document_url.startswith(("http://", "https://")):
+        parts = urlsplit(document_url)
+        query = urlencode(sorted(
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_signing_param(k)
+        ))
+        return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path}" + (f"?{query}" if query else "")
+    return os.path.abspath(document_url)
+
+
+def chunk_id_for(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def store_embeddings_for_text(
+    text: str,
+    source_id: str,
+    previous: Optional[Dict[str, Tuple[int, Optional[int]]]] = None,
+) -> int:
+    """
+    store_embeddings_for_pages for text without page information.
+    """
+    return store_embeddings_for_pages([(None, text)], source_id, previous)
+
+
+def store_embeddings_for_pages(
+    pages: Iterable[Tuple[Optional[int], str]],
+    source_id: str,
+    previous: Optional[Dict[str, Tuple[int, Optional[int]]]] = None,
+) -> int:
+    """
+    Chunk, index and embed a document's pages ([(page_number, text)]) into a
+    namespace (source_id): index_chunks followed by embed_chunks.
+    Returns number of chunks now in the namespace.
+    """
+    return embed_chunks(index_chunks(pages, source_id), source_id, previous)
+
+
+def index_chunks(pages: Iterable[Tuple[Optional[int], str]], source_id: str) -> List[Tuple[str, str, Dict]]:
+    """
+    Chunk pages into (chunk_id, text, metadata) records and save the namespace's
+    sentence index (heuristic answerer) and BM25 index (sparse retrieval), both
+    keyed by the vector ids. Neither needs embeddings, so the document can be
+    searched in sparse mode while embed_chunks is still running.
+    """
+    records = []
+    occurrences: Dict[str, int] = {}
+    with span("chunk"):
+        for chunk in iter_chunks(pages):
+            chunk_id = chunk_id_for(chunk.text)
+            seen = occurrences.get(chunk_id, 0)
+            occurrences[chunk_id] = seen + 1
+            if seen:
+                chunk_id = f"{chunk_id}-{seen}"  # repeated boilerplate chunk
+            metadata = {
+                "text": chunk.text if len(chunk.text) <= 2000 else chunk.text[:2000],
+                "chunk_index": chunk.index,
+                "source": source_id,
+            }
+            if chunk.page_start is not None:  # Pinecone rejects null metadata values
+                metadata["page"] = chunk.page_start
+                metadata["page_end"] = chunk.page_end
+            records.append((chunk_id, chunk.text, metadata))
+
+    with span("text_index"):
+        save_sentence_index(source_id, SentenceIndex.build((vid, text) for vid, text, _ in records))
+        save_sparse_index(source_id, BM25Index.build(records))
+    return records
+
+
+def embed_chunks(
+    records: List[Tuple[str, str, Dict]],
+    source_id: str,
+    previous: Optional[Dict[str, Tuple[int, Optional[int]]]] = None,
+) -> int:
+    """
+    Embed and upsert index_chunks records. Vector ids are content hashes of the
+    chunks. `previous` is the namespace's chunk manifest (chunk_id → (chunk_index, page))
+    when it already holds an earlier version: then only new chunks are embedded,
+    chunks that merely moved are re-upserted with their new position (embeddings
+    come from the cache), and chunks that disappeared are deleted.
+    Chunks are embedded in full batches, concurrently, with upserts overlapping
+    the next embedding batch (see ingest_pipeline).
+    Returns number of chunks now in the namespace.
+    """
+    store = get_vector_store()
+    previous = previous or {}
+    current = {vid: (meta["chunk_index"], meta.get("page")) for vid, _, meta in records}
+    changed = [r for r in records if previous.get(r[0]) != current[r[0]]]
+    removed = [vid for vid in previous if vid not in current]
+
+    def upsert(vectors: List[Dict]) -> None:
+        with span("upsert"):
+            store.upsert(vectors, namespace=source_id)
+
+    stats = run_embed_upsert_pipeline(
+        changed,
+        embed_fn=get_embedding_matrix,
+        upsert_fn=upsert,
+        dimension=get_embedding_dimension(),
+    )
+    if removed:
+        with span("delete"):
+            store.delete(removed, namespace=source_id)
+    manifest.replace_chunks(source_id, ((vid, idx, page) for vid, (idx, page) in current.items()))
+    logger.info(
+        "✅ Stored %d chunks under namespace=%s: %d new, %d moved, %d removed, %d unchanged %s",
+        len(records),
+        source_id,
+        sum(1 for vid in current if vid not in previous),
+        sum(1 for vid in current if vid in previous and previous[vid] != current[vid]),
+        len(removed),
+        len(records) - len(changed),
+        stats.as_dict(),
+    )
+    return len(records)
+
+
+# progress(stage, **details), called on the event loop as ingestion advances
+ProgressCallback = Callable[..., None]
+
+
+# One ingestion at a time per content hash and per document lineage: the same
+# bytes behind two URLs (e.g. re-signed links), or two versions of one document,
+# must not race their upserts into one namespace
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _key_lock(key: str) -> asyncio.Lock:
+    lock = _locks.get(key)
+    if lock is None:
+        lock = _locks[key] = asyncio.Lock()
+    return lock
+
+
+def _report(progress: Optional[ProgressCallback], stage: str, **details) -> None:
+    if progress is None:
+        return
+    try:
+        progress(stage, **details)
+    except Exception as e:
+        logger.warning("Ingestion progress callback failed: %s", e)
+
+
+async def ingest_document_async(document_url: str, progress: Optional[ProgressCallback] = None) -> str:
+    """
+    Extract text, embed, and upsert a document by URL.
+    The namespace is the SHA-256 of the document bytes, so the same file behind
+    a different (e.g. re-signed) URL is only embedded once; a repeat ingest is a
+    single manifest lookup.
+    Blocking steps run on the shared pools, never on the event loop.
+    `progress`, if given, receives "downloaded", "extracted", "searchable"
+    (text indexes ready, embeddings still running) and "indexed" stages.
+    Returns the source_id / namespace.
+    """
+    with span("download"):
+        doc = await run_io(open_document, document_url)
+    try:
+        _report(progress, "downloaded", bytes=doc.size)
+        async with _key_lock(doc.sha256), _key_lock(canonical_document(document_url)):
+            return await _ingest_local_copy(doc, document_url, progress)
+    finally:
+        doc.cleanup()
+
+
+async def _ingest_local_copy(
+    doc: DownloadedDocument,
+    document_url: str,
+    progress: Optional[ProgressCallback] = None,
+) -> str:
+    store = get_vector_store()
+    dimension = await run_io(get_embedding_dimension)
+
+    def compatible(e: Optional[Dict]) -> bool:
+        return bool(
+            e
+            and e["vector_store"] == store.name
+            and e["embedding_model"] == EMBED_MODEL
+            and e["dimension"] == dimension
+        )
+
+    content_hash = doc.sha256
+    entry = await run_io(manifest.lookup, content_hash)
+    if compatible(entry):
+        logger.info(
+            "♻️ Document already indexed under namespace=%s (%d chunks); skipping ingestion",
+            entry["namespace"],
+            entry["chunk_count"],
+        )
+        _report(progress, "indexed", chunks=entry["chunk_count"], cached=True)
+        return entry["namespace"]
+
+    # A revised version of a document we already hold is diffed into its namespace
+    document = canonical_document(document_url)
+    source_id, previous = content_hash, None
+    lineage = await run_io(manifest.lineage_namespace, document)
+    if lineage:
+        held = await run_io(manifest.content_hash_for, lineage)
+        if held and compatible(await run_io(manifest.lookup, held)):
+            chunks = await run_io(manifest.chunk_ids, lineage)
+            if chunks:  # namespaces written before content-hashed ids are rebuilt in full
+                source_id, previous = lineage, chunks
+                logger.info("🔁 Updating namespace=%s in place with a new version of %s", source_id, document)
+
+    if previous is not None:
+        # The old version's entry must not be served while the namespace changes
+        await run_io(manifest.forget_namespace, source_id)
+    else:
+        source_id = await run_io(_fresh_namespace, content_hash, entry, store)
+
+    with span("parse"):
+        pages = await run_cpu(extract_pages, doc.path)
+    characters = sum(len(text.strip()) for _, text in pages)
+    if not characters:
+        raise ValueError("No extractable text found in the document.")
+    _report(progress, "extracted", characters=characters, pages=len(pages))
+    records = await run_io(index_chunks, pages, source_id)
+    _report(progress, "searchable", namespace=source_id, chunks=len(records))
+    chunk_count = await run_io(embed_chunks, records, source_id, previous)
+    await run_io(
+        manifest.record,
+        content_hash,
+        namespace=source_id,
+        chunk_count=chunk_count,
+        embedding_model=EMBED_MODEL,
+        dimension=dimension,
+        source_url=document_url,
+        vector_store=store.name,
+    )
+    await run_io(manifest.set_lineage, document, source_id)
+    _report(progress, "indexed", chunks=chunk_count, cached=False)
+    return source_id
+
+
+def _fresh_namespace(content_hash: str, entry: Optional[Dict], store) -> str:
+    """
+    Namespace for a document indexed from scratch. An earlier index of the same
+    bytes with a different model/dimension is dropped and rebuilt in place.
+    Otherwise the content hash, unless that namespace may hold another document
+    (e.g. a later version updated in place under this hash): then a new name.
+    """
+    if entry and entry["vector_store"] == store.name and manifest.content_hash_for(entry["namespace"]) == content_hash:
+        namespace = entry["namespace"]
+        logger.info("Re-ingesting namespace=%s with model=%s", namespace, EMBED_MODEL)
+        try:
+            store.delete_namespace(namespace)
+        except Exception as e:
+            logger.warning("Could not clear namespace=%s before re-ingest: %s", namespace, e)
+        return namespace
+    if not manifest.namespace_in_use(content_hash):
+        return content_hash
+    namespace = f"{content_hash}-{uuid.uuid4().hex[:8]}"
+    logger.info("Namespace=%s holds another document; indexing into namespace=%s", content_hash, namespace)
+    return namespace
+
+
+def ingest_document(document_url: str) -> str:
+    """
+    Blocking wrapper around ingest_document_async for scripts and sync callers.
+    Returns the source_id / namespace.
+    """
+    return asyncio.run(ingest_document_async(document_url))
@@ -0,0 +1,227 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from backend.services.storage import data_path
+
+logger = logging.getLogger(__name__)
+
+# One SQLite file shared by every worker process; WAL keeps readers and writers apart.
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH") or data_path("manifest.sqlite3")
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(
+            MANIFEST_PATH, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                content_hash    TEXT PRIMARY KEY,
+                namespace       TEXT NOT NULL,
+                chunk_count     INTEGER NOT NULL,
+                embedding_model TEXT NOT NULL,
+                dimension       INTEGER NOT NULL,
+                source_url      TEXT,
+                ingested_at     REAL NOT NULL,
+                vector_store    TEXT NOT NULL DEFAULT 'pinecone'
+            )
+            """
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}
+        if "vector_store" not in columns:  # manifests written before pluggable stores
+            conn.execute("ALTER TABLE documents ADD COLUMN vector_store TEXT NOT NULL DEFAULT 'pinecone'")
+        conn.execute("CREATE INDEX IF NOT EXISTS documents_url ON documents (source_url)")
+        conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # Chunk ids (content hashes) currently stored in each namespace, for incremental re-ingestion
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                namespace   TEXT NOT NULL,
+                chunk_id    TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                page        INTEGER,
+                PRIMARY KEY (namespace, chunk_id)
+            )
+            """
+        )
+        if "page" not in {row["name"] for row in conn.execute("PRAGMA table_info(chunks)")}:
+            conn.execute("ALTER TABLE chunks ADD COLUMN page INTEGER")
+        # Which namespace holds the latest version of a document (keyed by canonical URL)
+        conn.execute("CREATE TABLE IF NOT EXISTS lineage (document TEXT PRIMARY KEY, namespace TEXT NOT NULL)")
+        _conn = conn
+    return _conn
+
+
+def lookup(content_hash: str) -> Optional[Dict]:
+    """
+    Return the manifest entry for a document's content hash, or None.
+    """
+    with _lock:
+        row = _connect().execute(
+            "SELECT * FROM documents WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def namespace_for_url(source_url: str) -> Optional[str]:
+    """
+    Most recently ingested namespace for a URL (best effort; signed URLs rotate).
+    """
+    with _lock:
+        row = _connect().execute(
+            "SELECT namespace FROM documents WHERE source_url = ? ORDER BY ingested_at DESC LIMIT 1",
+            (source_url,),
+        ).fetchone()
+    return row["namespace"] if row else None
+
+
+def content_hash_for(namespace: str) -> Optional[str]:
+    """
+    Content hash of the document currently held in a namespace.
+    """
+    with _lock:
+        row = _connect().execute(
+            "SELECT content_hash FROM documents WHERE namespace = ? ORDER BY ingested_at DESC LIMIT 1",
+            (namespace,),
+        ).fetchone()
+    return row["content_hash"] if row else None
+
+
+def namespace_in_use(namespace: str) -> bool:
+    """
+    Whether a document entry or a chunk list refers to a namespace, i.e. it may
+    hold another document's vectors (including one being updated in place).
+    """
+    with _lock:
+        conn = _connect()
+        row = conn.execute("SELECT 1 FROM documents WHERE namespace = ? LIMIT 1", (namespace,)).fetchone()
+        if row is None:
+            row = conn.execute("SELECT 1 FROM chunks WHERE namespace = ? LIMIT 1", (namespace,)).fetchone()
+    return row is not None
+
+
+def record(
+    content_hash: str,
+    namespace: str,
+    chunk_count: int,
+    embedding_model: str,
+    dimension: int,
+    source_url: Optional[str] = None,
+    vector_store: str = "pinecone",
+) -> None:
+    """
+    Insert or replace the manifest entry for a freshly ingested document.
+    """
+    with _lock:
+        _connect().execute(
+            """
+            INSERT OR REPLACE INTO documents
+                (content_hash, namespace, chunk_count, embedding_model, dimension, source_url, ingested_at, vector_store)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (content_hash, namespace, chunk_count, embedding_model, dimension, source_url, time.time(), vector_store),
+        )
+
+
+def forget_namespace(namespace: str) -> None:
+    """
+    Drop the entries of every document version held in a namespace, e.g.
+    before a revised version is written over it.
+    """
+    with _lock:
+        _connect().execute("DELETE FROM documents WHERE namespace = ?", (namespace,))
+
+
+def chunk_ids(namespace: str) -> Dict[str, Tuple[int, Optional[int]]]:
+    """
+    chunk_id → (chunk_index, page) for the chunks stored in a namespace.
+    """
+    with _lock:
+        rows = _connect().execute(
+            "SELECT chunk_id, chunk_index, page FROM chunks WHERE namespace = ?", (namespace,)
+        ).fetchall()
+    return {row["chunk_id"]: (row["chunk_index"], row["page"]) for row in rows}
+
+
+def replace_chunks(namespace: str, chunks: Iterable[Tuple[str, int, Optional[int]]]) -> None:
+    """
+    Replace a namespace's chunk manifest with (chunk_id, chunk_index, page) rows.
+    """
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN")
+        try:
+            conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (namespace, chunk_id, chunk_index, page) VALUES (?, ?, ?, ?)",
+                ((namespace, cid, idx, page) for cid, idx, page in chunks),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def lineage_namespace(document: str) -> Optional[str]:
+    """
+    Namespace holding the latest ingested version of a document (canonical URL or path).
+    """
+    with _lock:
+        row = _connect().execute("SELECT namespace FROM lineage WHERE document = ?", (document,)).fetchone()
+    return row["namespace"] if row else None
+
+
+def set_lineage(document: str, namespace: str) -> None:
+    with _lock:
+        _connect().execute(
+            "INSERT OR REPLACE INTO lineage (document, namespace) VALUES (?, ?)", (document, namespace)
+        )
+
+
+def clear(vector_store: Optional[str] = None) -> None:
+    """
+    Drop every entry (or those of one vector store), e.g. after its index was recreated,
+    together with the chunk lists and lineage of the namespaces involved.
+    """
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN")
+        try:
+            if vector_store is None:
+                for table in ("chunks", "lineage", "documents"):
+                    conn.execute(f"DELETE FROM {table}")
+            else:
+                owned = "SELECT namespace FROM documents WHERE vector_store = ?"
+                conn.execute(f"DELETE FROM chunks WHERE namespace IN ({owned})", (vector_store,))
+                conn.execute(f"DELETE FROM lineage WHERE namespace IN ({owned})", (vector_store,))
+                conn.execute("DELETE FROM documents WHERE vector_store = ?", (vector_store,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    logger.warning("Ingestion manifest cleared (vector_store=%s).", vector_store or "all")
+
+
+def get_setting(key: str) -> Optional[str]:
+    """
+    Small persisted key/value facts (e.g. detected embedding dimension).
+    """
+    with _lock:
+        row = _connect().execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def set_setting(key: str, value: str) -> None:
+    with _lock:
+        _connect().execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
@@ -0,0 +1,254 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# "auto": start recording once /metrics has been scraped (nothing is paid until a
+# scraper shows up); "1": always record; "0": never
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "auto").lower()
+_recording = METRICS_ENABLED in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+LabelKey = Tuple[str, ...]
+# A collector returns (name, type, help, [(labels, value)]) families computed at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+_metrics: List["_Metric"] = []
+_collectors: List[Collector] = []
+
+
+def recording() -> bool:
+    return _recording
+
+
+def activate() -> None:
+    """
+    Start recording (called on the first scrape in "auto" mode).
+    """
+    global _recording
+    if METRICS_ENABLED != "0":
+        _recording = True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, object] = {}
+        _metrics.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def exposition(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count; only recorded while metrics are on."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not _recording:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Current value; always tracked, since an inc/dec pair must not straddle activation."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Bucketed observations with sum and count; only recorded while metrics are on."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        if not _recording:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def exposition(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def register_collector(collector: Collector) -> None:
+    """
+    Add values computed at scrape time (e.g. cache statistics kept elsewhere).
+    """
+    _collectors.append(collector)
+
+
+def render() -> str:
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    lines: List[str] = []
+    for metric in list(_metrics):
+        lines.extend(metric.exposition())
+    for collector in list(_collectors):
+        for name, kind, help, samples in collector():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Pipeline metrics --------------------------------------------------------
+
+STAGE_SECONDS = Histogram(
+    "policypal_stage_seconds",
+    "Time spent per pipeline stage.",
+    ("stage", "outcome"),
+)
+EMBED_BATCH_SIZE = Histogram(
+    "policypal_embed_batch_size",
+    "Texts per Gemini embedding request.",
+    buckets=SIZE_BUCKETS,
+)
+EMBED_CONCURRENCY_LIMIT = Gauge(
+    "policypal_embed_concurrency_limit",
+    "Current adaptive limit on concurrent Gemini embedding requests.",
+)
+GEMINI_RETRIES = Counter(
+    "policypal_gemini_retries_total",
+    "Gemini calls retried, by API and reason.",
+    ("api", "reason"),
+)
+LLM_CALLS = Counter(
+    "policypal_llm_calls_total",
+    "Gemini generations by outcome (ok, error, timeout, budget: cut short by the request's budget, rejected while the circuit is open).",
+    ("outcome",),
+)
+LLM_HEDGES = Counter(
+    "policypal_llm_hedges_total",
+    "Hedged Gemini generations, by which request answered first.",
+    ("winner",),
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "policypal_llm_circuit_open",
+    "1 while the Gemini circuit breaker is rejecting calls.",
+)
+ANSWERS = Counter(
+    "policypal_answers_total",
+    "Answers produced, by source (cache, semantic, llm, fallback).",
+    ("source",),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "policypal_requests_in_flight",
+    "HTTP requests currently being handled.",
+)
+REQUEST_SECONDS = Histogram(
+    "policypal_request_seconds",
+    "HTTP request latency until the response starts.",
+    ("route", "status"),
+)
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        STAGE_SECONDS.observe(
+            time.perf_counter() - self.start, stage=self.stage, outcome="error" if exc_type else "ok"
+        )
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    """
+    Time a block into policypal_stage_seconds{stage}. While metrics are off this
+    returns a shared no-op, so wrapping hot paths costs one flag check.
+    """
+    return _Span(stage) if _recording else _NO_SPAN
@@ -1,40 +1,39 @@
 import re
-from typing import List, Dict
-
-# Simple keyword-ish scoring to pick relevant lines from chunks
-def _score_line(q_tokens: set, line: str) -> float:
-    text = line.lower()
-    score = 0.0
-    # overlap with query tokens
-    for t in q_tokens:
-        if len(t) > 2 and t in text:
-            score += 1.0
-    # presence of numbers often matters in policies
-    if re.search(r"\b\d+\b", text):
-        score += 0.3
-    return score
-
-def _tokenize(text: str) -> List[str]:
-    return re.findall(r"[a-zA-Z0-9]+", text.lower())
-
-def answer_one_question(question: str, retrieved: List[Dict], max_lines: int = 2) -> str:
+from typing import List, Dict, Optional, Tuple
+
+from backend.services.sentence_index import SentenceIndex
+
+
+def answer_spans(
+    question: str,
+    retrieved: List[Dict],
+    max_lines: int = 2,
+    index: Optional[SentenceIndex] = None,
+) -> List[Tuple[str, str, float]]:
+    """
+    Top (sentence, chunk id, score) spans for a question within the retrieved chunks.
+    Uses the document's precomputed sentence index when it covers the retrieved
+    chunks; otherwise indexes the retrieved text on the fly.
+    """
+    keys = [str(r.get("id") if r.get("id") is not None else i) for i, r in enumerate(retrieved)]
+    if index is None or not index.has_chunks(keys):
+        index = SentenceIndex.build((k, r.get("text", "")) for k, r in zip(keys, retrieved))
+    return index.top_spans(question, chunk_keys=keys, k=max_lines)
+
+
+def answer_one_question(
+    question: str,
+    retrieved: List[Dict],
+    max_lines: int = 2,
+    index: Optional[SentenceIndex] = None,
+) -> str:
     if not retrieved:
         return "Could not find relevant information in the document."
 
-    # Combine texts of retrieved chunks
-    corpus = "\n".join([r.get("text", "") for r in retrieved if r.get("text")])
-    if not corpus:
+    if not any(r.get("text") for r in retrieved):
         return "Could not find relevant information in the document."
 
-    q_tokens = set(_tokenize(question))
-    # Split into candidate sentences/clauses
-    lines = [ln.strip() for ln in re.split(r"[.\n]", corpus) if ln.strip()]
-    if not lines:
-        return "Could not find relevant information in the document."
-
-    scored = [(ln, _score_line(q_tokens, ln)) for ln in lines]
-    scored.sort(key=lambda x: x[1], reverse=True)
-    top = [ln for ln, sc in scored[:max_lines] if sc > 0]
+    top = [text for text, _, _ in answer_spans(question, retrieved, max_lines=max_lines, index=index)]
 
     if not top:
         # fallback to first chunk
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.services.vector_codec import VECTOR_CODEC, EncodedVectors, encode
+
+# Cosine similarity above which a cached question's answer is reused
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_PER_DOC = int(os.getenv("SEMANTIC_CACHE_MAX_PER_DOC", "512"))
+SEMANTIC_CACHE_MAX_DOCS = int(os.getenv("SEMANTIC_CACHE_MAX_DOCS", "256"))
+
+
+class _DocEntries:
+    """Fixed-capacity matrix of unit-normalized, encoded question vectors plus their answers."""
+
+    def __init__(self, dim: int, capacity: int, codec: str):
+        self.vectors = EncodedVectors.empty(capacity, dim, codec)
+        self.answers: List[Optional[str]] = [None] * capacity
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+
+    def slot(self) -> int:
+        if self.count < len(self.answers):
+            self.count += 1
+            return self.count - 1
+        return int(np.argmin(self.last_used))  # evict least recently used
+
+
+def _normalize(vectors) -> np.ndarray:
+    q = np.asarray(vectors, dtype=np.float32)
+    if q.ndim == 1:
+        q = q[None, :]
+    norms = np.linalg.norm(q, axis=1, keepdims=True)
+    return q / np.where(norms == 0, 1.0, norms)
+
+
+class SemanticQuestionCache:
+    """
+    Per-document cache of answered questions keyed by their embeddings.
+    Lookups are one matrix product against the document's cached questions,
+    scored on their `codec` encoding (see vector_codec).
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_per_doc: int = SEMANTIC_CACHE_MAX_PER_DOC,
+        max_docs: int = SEMANTIC_CACHE_MAX_DOCS,
+        codec: str = VECTOR_CODEC,
+    ):
+        self.threshold = threshold
+        self.codec = codec
+        self.max_per_doc = max_per_doc
+        self.max_docs = max_docs
+        self._docs: "OrderedDict[str, _DocEntries]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, doc_key: str, vectors: Sequence[Sequence[float]]) -> List[Optional[Tuple[str, float]]]:
+        """
+        For each question vector: (cached answer, similarity) if a cached
+        question is similar enough, else None.
+        """
+        q = _normalize(vectors)
+        with self._lock:
+            entries = self._docs.get(doc_key)
+            if entries is None or entries.count == 0 or entries.vectors.dim != q.shape[1]:
+                self.misses += len(q)
+                return [None] * len(q)
+            self._docs.move_to_end(doc_key)
+            sims = entries.vectors[: entries.count].dot(q).T  # (questions, cached)
+            best = np.argmax(sims, axis=1)
+            best_sim = sims[np.arange(len(q)), best]
+            out: List[Optional[Tuple[str, float]]] = []
+            for slot, sim in zip(best.tolist(), best_sim.tolist()):
+                if sim >= self.threshold:
+                    self._clock += 1
+                    entries.last_used[slot] = self._clock
+                    out.append((entries.answers[slot], sim))
+                    self.hits += 1
+                else:
+                    out.append(None)
+                    self.misses += 1
+            return out
+
+    def add(self, doc_key: str, vectors: Sequence[Sequence[float]], answers: Sequence[str]) -> None:
+        q = _normalize(vectors)
+        with self._lock:
+            entries = self._docs.get(doc_key)
+            if entries is None or entries.vectors.dim != q.shape[1]:
+                entries = self._docs[doc_key] = _DocEntries(q.shape[1], self.max_per_doc, self.codec)
+                while len(self._docs) > self.max_docs:
+                    self._docs.popitem(last=False)
+            self._docs.move_to_end(doc_key)
+            encoded = encode(q, self.codec)
+            for row, answer in zip(range(len(encoded)), answers):
+                slot = entries.slot()
+                self._clock += 1
+                entries.vectors.assign(slot, encoded[row])
+                entries.answers[slot] = answer
+                entries.last_used[slot] = self._clock
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "bytes": sum(e.vectors.nbytes for e in self._docs.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+question_cache = SemanticQuestionCache()
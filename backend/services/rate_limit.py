@@ -0,0 +1,104 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+class TokenBucket:
+    """
+    Process-wide request rate limiter: `rate` tokens per second, bursts up to
+    `burst`. A rate <= 0 disables limiting. pause() holds every caller back
+    until a deadline, e.g. a server's Retry-After.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                if delay <= 0:
+                    if self.rate <= 0:
+                        return waited
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return waited
+                    delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: each success raises the limit by 1/limit (about +1
+    per round trip at full load, up to `maximum`); a throttling response halves
+    it (down to `minimum`). Decreases are spaced by `cooldown` seconds so one
+    burst of concurrent 429s counts as a single signal.
+    """
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: int = 1,
+        cooldown: float = 1.0,
+        on_change: Optional[Callable[[float], None]] = None,
+    ):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.cooldown = cooldown
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._on_change = on_change
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify()
+
+    def on_success(self) -> None:
+        with self._cond:
+            if self.limit >= self.maximum:
+                return
+            before = int(self.limit)
+            self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            if int(self.limit) > before:
+                self._cond.notify()
+        self._changed()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self.limit = max(float(self.minimum), self.limit / 2)
+        self._changed()
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change(self.limit)
@@ -1,51 +1,193 @@
-from typing import List, Dict, Optional
-from backend.services.embedding import get_embedding
-from backend.services.pinecone_store import index
+import asyncio
+import logging
+from typing import Any, List, Dict, Optional
+from backend.services.embedding import get_embedding, aget_embeddings
+from backend.services.vector_store import get_vector_store
+from backend.services.sparse_index import load_sparse_index
+from backend.services.concurrency import run_cpu, run_io
+from backend.services.metrics import span
 
-def semantic_search(
-    question: str,
-    top_k: int = 5,
-    namespace: str = "default",
-    fltr: Optional[Dict] = None,
-    min_score: float = 0.0,
-) -> List[Dict]:
-    """
-    Semantic search over Pinecone for a natural-language question.
-    IMPORTANT: pass the correct 'namespace' = source_id to isolate per document.
-    """
-    # 1) Embed the query
-    q_vec = get_embedding(question)
+logger = logging.getLogger(__name__)
 
-    # 2) Query Pinecone
-    res = index.query(
-        vector=q_vec,
-        top_k=top_k,
-        include_metadata=True,
-        include_values=False,
-        namespace=namespace,
-        filter=fltr,
-    )
+RETRIEVAL_MODES = ("dense", "sparse", "hybrid")
+RRF_K = 60  # reciprocal-rank fusion constant
 
-    # 3) Normalize response across client versions
-    matches = getattr(res, "matches", None) or res.get("matches", [])
 
-    # 4) Shape results for downstream LLM
+def _shape_matches(matches: List[Dict], min_score: float) -> List[Dict]:
+    # Shape results for downstream LLM
     results: List[Dict] = []
     for m in matches:
-        m_id  = getattr(m, "id", None)     if not isinstance(m, dict) else m.get("id")
-        score = getattr(m, "score", 0.0)    if not isinstance(m, dict) else float(m.get("score", 0.0))
-        meta  = getattr(m, "metadata", {})  if not isinstance(m, dict) else m.get("metadata", {})
+        score = m["score"]
+        meta = m["metadata"]
 
         if score is None or score < min_score:
             continue
 
         results.append({
-            "id": m_id,
+            "id": m["id"],
             "score": float(score),
             "text": meta.get("text", ""),
             "chunk_index": meta.get("chunk_index"),
             "source": meta.get("source"),
-            # "page": meta.get("page"),  # add later if you track pages
+            "page": meta.get("page"),
+            "page_end": meta.get("page_end"),
         })
 
     return results
+
+
+def _passes_filter(meta: Dict, fltr: Optional[Dict[str, Any]]) -> bool:
+    # Same filter subset the local vector store supports: equality, $eq, $ne, $in
+    for field, cond in (fltr or {}).items():
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        value = meta.get(field)
+        for op, expected in cond.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+    return True
+
+
+def _sparse_search(question: str, top_k: int, namespace: str, fltr: Optional[Dict]) -> List[Dict]:
+    """
+    BM25 over the namespace's ingestion-time index; fully in-process.
+    """
+    return _sparse_search_many([question], top_k, namespace, fltr)[0]
+
+
+def _sparse_search_many(questions: List[str], top_k: int, namespace: str, fltr: Optional[Dict]) -> List[List[Dict]]:
+    """
+    _sparse_search for several questions, loading the index once.
+    Blocking (index load from disk, scoring): async callers run it on the CPU pool.
+    """
+    index = load_sparse_index(namespace)
+    if index is None:
+        logger.warning("No sparse index for namespace=%s", namespace)
+        return [[] for _ in questions]
+    out = []
+    for question in questions:
+        with span("sparse_query"):
+            matches = index.search(question, top_k=top_k * 2 if fltr else top_k)
+        matches = [m for m in matches if _passes_filter(m["metadata"], fltr)][:top_k]
+        out.append(_shape_matches(matches, 0.0))
+    return out
+
+
+def _vector_query(store, vector: List[float], top_k: int, namespace: str, fltr: Optional[Dict]) -> List[Dict]:
+    with span("vector_query"):
+        return store.query(vector, top_k=top_k, namespace=namespace, fltr=fltr)
+
+
+def _fuse(dense: List[Dict], sparse: List[Dict], top_k: int) -> List[Dict]:
+    """
+    Reciprocal-rank fusion; the fused score replaces the per-retriever scores.
+    """
+    fused: Dict[str, Dict] = {}
+    for results in (dense, sparse):
+        for rank, r in enumerate(results):
+            key = r["id"]
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = dict(r, score=0.0)
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.values(), key=lambda r: r["score"], reverse=True)[:top_k]
+
+
+def _combine(mode: str, dense: Optional[List[Dict]], sparse: Optional[List[Dict]], top_k: int) -> List[Dict]:
+    if mode == "dense":
+        return dense or []
+    if mode == "sparse" or dense is None:
+        return sparse or []
+    if not sparse:
+        return dense
+    return _fuse(dense, sparse, top_k)
+
+
+def semantic_search(
+    question: str,
+    top_k: int = 5,
+    namespace: str = "default",
+    fltr: Optional[Dict] = None,
+    min_score: float = 0.0,
+    mode: str = "dense",
+) -> List[Dict]:
+    """
+    Search the vector store and/or the BM25 index for a natural-language question.
+    mode: "dense" (embeddings), "sparse" (BM25, no network calls) or "hybrid" (RRF of both).
+    IMPORTANT: pass the correct 'namespace' = source_id to isolate per document.
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    sparse = _sparse_search(question, top_k, namespace, fltr) if mode != "dense" else None
+    dense = None
+    if mode != "sparse":
+        # 1) Embed the query
+        q_vec = get_embedding(question)
+
+        # 2) Query the vector store
+        matches = _vector_query(get_vector_store(), q_vec, top_k, namespace, fltr)
+
+        # 3) Shape
+        dense = _shape_matches(matches, min_score)
+
+    return _combine(mode, dense, sparse, top_k)
+
+
+async def search_by_vectors_async(
+    vectors: List[List[float]],
+    top_k: int = 5,
+    namespace: str = "default",
+    fltr: Optional[Dict] = None,
+    min_score: float = 0.0,
+) -> List[List[Dict]]:
+    """
+    Run one vector query per (already embedded) question, concurrently.
+    """
+    store = get_vector_store()
+    matches = await asyncio.gather(*[
+        run_io(_vector_query, store, vec, top_k, namespace, fltr)
+        for vec in vectors
+    ])
+    return [_shape_matches(m, min_score) for m in matches]
+
+
+async def semantic_search_many_async(
+    questions: List[str],
+    top_k: int = 5,
+    namespace: str = "default",
+    fltr: Optional[Dict] = None,
+    min_score: float = 0.0,
+    mode: str = "dense",
+    vectors: Optional[List[List[float]]] = None,
+) -> List[List[Dict]]:
+    """
+    Per-question search: all questions are embedded in one batched call (or
+    `vectors` are reused if the caller already has them), then the vector
+    queries run concurrently. In hybrid mode an embedding failure degrades to
+    sparse-only instead of failing. Results align with `questions`.
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    sparse = [None] * len(questions)
+    if mode != "dense":
+        sparse = await run_cpu(_sparse_search_many, questions, top_k, namespace, fltr)
+
+    dense = [None] * len(questions)
+    if mode != "sparse":
+        try:
+            q_vecs = vectors if vectors is not None else await aget_embeddings(questions)
+            dense = await search_by_vectors_async(
+                q_vecs, top_k=top_k, namespace=namespace, fltr=fltr, min_score=min_score
+            )
+        except Exception as e:
+            if mode == "dense":
+                raise
+            logger.warning("Dense retrieval failed (%s); answering from the sparse index only", e)
+
+    return [_combine(mode, d, s, top_k) for d, s in zip(dense, sparse)]
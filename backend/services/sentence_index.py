@@ -0,0 +1,187 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.services.index_files import IndexCache, index_path, pack_strings, save_npz, unpack_strings
+
+SENTENCE_INDEX_CACHE_SIZE = int(os.getenv("SENTENCE_INDEX_CACHE_SIZE", "64"))
+
+NUMBER_BONUS = 0.3  # presence of numbers often matters in policies
+_TOKEN_RE = re.compile(r"[a-zA-Z0-9]+")
+_SPLIT_RE = re.compile(r"[.\n]")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SentenceIndex:
+    """
+    Sentence segmentation of a document's chunks plus an inverted index
+    (term → sentence ids, CSR layout), built once at ingestion.
+    Each chunk's sentences are a contiguous range, so restricting scoring to
+    retrieved chunks is a handful of slices.
+    """
+
+    def __init__(
+        self,
+        sentences: List[str],
+        chunk_keys: List[str],
+        chunk_starts: np.ndarray,
+        has_number: np.ndarray,
+        vocab: Dict[str, int],
+        postings_indptr: np.ndarray,
+        postings: np.ndarray,
+    ):
+        self.sentences = sentences
+        self.chunk_keys = chunk_keys
+        self.chunk_starts = chunk_starts  # len(chunk_keys) + 1 boundaries into sentences
+        self.has_number = has_number
+        self.vocab = vocab
+        self.postings_indptr = postings_indptr
+        self.postings = postings
+        self._chunk_pos = {key: i for i, key in enumerate(chunk_keys)}
+
+    @classmethod
+    def build(cls, chunks: Iterable[Tuple[str, str]]) -> "SentenceIndex":
+        """
+        chunks: (chunk id, chunk text) in document order.
+        """
+        sentences: List[str] = []
+        chunk_keys: List[str] = []
+        chunk_starts = [0]
+        term_sentences: Dict[str, List[int]] = {}
+        for key, text in chunks:
+            chunk_keys.append(str(key))
+            for ln in _SPLIT_RE.split(text or ""):
+                ln = ln.strip()
+                if not ln:
+                    continue
+                sid = len(sentences)
+                sentences.append(ln)
+                for term in set(tokenize(ln)):
+                    if len(term) > 2:
+                        term_sentences.setdefault(term, []).append(sid)
+            chunk_starts.append(len(sentences))
+
+        vocab = {term: i for i, term in enumerate(term_sentences)}
+        lengths = [len(term_sentences[t]) for t in vocab]
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        postings = np.fromiter(
+            (sid for t in vocab for sid in term_sentences[t]), dtype=np.int32, count=int(indptr[-1])
+        )
+        has_number = np.fromiter(
+            (_NUMBER_RE.search(s) is not None for s in sentences), dtype=bool, count=len(sentences)
+        )
+        return cls(
+            sentences, chunk_keys, np.asarray(chunk_starts, dtype=np.int64),
+            has_number, vocab, indptr, postings,
+        )
+
+    def has_chunks(self, chunk_keys: Iterable[str]) -> bool:
+        return all(str(k) in self._chunk_pos for k in chunk_keys)
+
+    def score_all(self, question: str) -> np.ndarray:
+        """
+        Score every sentence: one point per distinct query term it contains,
+        plus NUMBER_BONUS when it mentions a number.
+        """
+        term_ids = [self.vocab[t] for t in set(tokenize(question)) if len(t) > 2 and t in self.vocab]
+        n = len(self.sentences)
+        if term_ids:
+            hits = np.concatenate([
+                self.postings[self.postings_indptr[t]:self.postings_indptr[t + 1]] for t in term_ids
+            ])
+            scores = np.bincount(hits, minlength=n).astype(np.float32)
+        else:
+            scores = np.zeros(n, dtype=np.float32)
+        scores += NUMBER_BONUS * self.has_number
+        return scores
+
+    def top_spans(
+        self,
+        question: str,
+        chunk_keys: Optional[Sequence[str]] = None,
+        k: int = 2,
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Best (sentence, chunk id, score) spans with score > 0, optionally
+        restricted to chunks in the given order (ties keep that order).
+        """
+        scores = self.score_all(question)
+        if chunk_keys is None:
+            positions = range(len(self.chunk_keys))
+        else:
+            positions = [self._chunk_pos[str(key)] for key in chunk_keys if str(key) in self._chunk_pos]
+        ranges = [np.arange(self.chunk_starts[p], self.chunk_starts[p + 1]) for p in positions]
+        if not ranges:
+            return []
+        candidates = np.concatenate(ranges)
+        if candidates.size == 0:
+            return []
+        sentence_chunk = np.repeat(
+            np.asarray(list(positions), dtype=np.int64), [len(r) for r in ranges]
+        )
+        order = np.argsort(-scores[candidates], kind="stable")
+
+        spans: List[Tuple[str, str, float]] = []
+        seen = set()
+        for o in order:
+            sid = candidates[o]
+            score = float(scores[sid])
+            if score <= 0:
+                break
+            text = self.sentences[sid]
+            if text in seen:  # chunk overlap repeats sentences
+                continue
+            seen.add(text)
+            spans.append((text, self.chunk_keys[sentence_chunk[o]], score))
+            if len(spans) >= k:
+                break
+        return spans
+
+    def save(self, path: str) -> None:
+        sent_blob, sent_offsets = pack_strings(self.sentences)
+        key_blob, key_offsets = pack_strings(self.chunk_keys)
+        vocab_blob, vocab_offsets = pack_strings(list(self.vocab))
+        save_npz(
+            path,
+            sent_blob=sent_blob, sent_offsets=sent_offsets,
+            key_blob=key_blob, key_offsets=key_offsets,
+            vocab_blob=vocab_blob, vocab_offsets=vocab_offsets,
+            chunk_starts=self.chunk_starts, has_number=self.has_number,
+            postings_indptr=self.postings_indptr, postings=self.postings,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SentenceIndex":
+        with np.load(path) as z:
+            terms = unpack_strings(z["vocab_blob"], z["vocab_offsets"])
+            return cls(
+                unpack_strings(z["sent_blob"], z["sent_offsets"]),
+                unpack_strings(z["key_blob"], z["key_offsets"]),
+                z["chunk_starts"],
+                z["has_number"],
+                {t: i for i, t in enumerate(terms)},
+                z["postings_indptr"],
+                z["postings"],
+            )
+
+
+_FILENAME = "sentences.npz"
+_cache: IndexCache[SentenceIndex] = IndexCache(_FILENAME, SentenceIndex.load, SENTENCE_INDEX_CACHE_SIZE)
+
+
+def save_sentence_index(namespace: str, index: SentenceIndex) -> None:
+    index.save(index_path(namespace, _FILENAME))
+
+
+def load_sentence_index(namespace: str) -> Optional[SentenceIndex]:
+    """
+    Load a namespace's sentence index (LRU-cached, reloaded when the file changes).
+    """
+    return _cache.get(namespace)
@@ -0,0 +1,141 @@
+import os
+import json
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.services.index_files import IndexCache, index_path, pack_strings, save_npz, unpack_strings
+from backend.services.sentence_index import tokenize
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+SPARSE_INDEX_CACHE_SIZE = int(os.getenv("SPARSE_INDEX_CACHE_SIZE", "64"))
+
+
+class BM25Index:
+    """
+    Compact BM25 inverted index over a namespace's chunks.
+    Postings store the final BM25 weight of (term, chunk), so a query is one
+    weighted bincount over the query terms' postings. Chunk metadata is kept
+    so sparse-only retrieval needs neither the embedding API nor the vector store.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        metadata: List[Dict],
+        vocab: Dict[str, int],
+        indptr: np.ndarray,
+        postings: np.ndarray,
+        weights: np.ndarray,
+    ):
+        self.ids = ids
+        self.metadata = metadata
+        self.vocab = vocab
+        self.indptr = indptr
+        self.postings = postings
+        self.weights = weights
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str, Dict]], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        """
+        records: (chunk id, chunk text, metadata) in document order.
+        """
+        ids: List[str] = []
+        metadata: List[Dict] = []
+        term_freqs: List[Counter] = []
+        for vid, text, meta in records:
+            ids.append(str(vid))
+            metadata.append(meta)
+            term_freqs.append(Counter(tokenize(text)))
+
+        n_docs = len(ids)
+        doc_len = np.asarray([sum(tf.values()) for tf in term_freqs], dtype=np.float32)
+        avg_len = float(doc_len.mean()) if n_docs else 0.0
+
+        term_docs: Dict[str, List[Tuple[int, int]]] = {}
+        for d, tf in enumerate(term_freqs):
+            for term, count in tf.items():
+                term_docs.setdefault(term, []).append((d, count))
+
+        vocab = {term: i for i, term in enumerate(term_docs)}
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum([len(term_docs[t]) for t in vocab], out=indptr[1:])
+        postings = np.empty(int(indptr[-1]), dtype=np.int32)
+        tfs = np.empty(int(indptr[-1]), dtype=np.float32)
+        idf = np.empty(int(indptr[-1]), dtype=np.float32)
+        for t, term in enumerate(vocab):
+            docs = term_docs[term]
+            lo, hi = indptr[t], indptr[t + 1]
+            postings[lo:hi] = [d for d, _ in docs]
+            tfs[lo:hi] = [c for _, c in docs]
+            df = len(docs)
+            idf[lo:hi] = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+        norm = k1 * (1.0 - b + b * doc_len[postings] / (avg_len or 1.0))
+        weights = (idf * tfs * (k1 + 1.0) / (tfs + norm)).astype(np.float32)
+        return cls(ids, metadata, vocab, indptr, postings, weights)
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        """
+        Top-k chunks as {"id", "score", "metadata"}, best first.
+        """
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids or top_k <= 0:
+            return []
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        docs = np.concatenate([self.postings[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        scores = np.bincount(docs, weights=weights, minlength=len(self.ids))
+
+        hit = np.flatnonzero(scores)
+        k = min(top_k, hit.size)
+        if k == 0:
+            return []
+        top = hit[np.argpartition(-scores[hit], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {"id": self.ids[d], "score": float(scores[d]), "metadata": self.metadata[d]}
+            for d in top.tolist()
+        ]
+
+    def save(self, path: str) -> None:
+        id_blob, id_offsets = pack_strings(self.ids)
+        vocab_blob, vocab_offsets = pack_strings(list(self.vocab))
+        meta_blob = np.frombuffer(json.dumps(self.metadata).encode("utf-8"), dtype=np.uint8)
+        save_npz(
+            path,
+            id_blob=id_blob, id_offsets=id_offsets,
+            vocab_blob=vocab_blob, vocab_offsets=vocab_offsets,
+            meta_blob=meta_blob,
+            indptr=self.indptr, postings=self.postings, weights=self.weights,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as z:
+            terms = unpack_strings(z["vocab_blob"], z["vocab_offsets"])
+            return cls(
+                unpack_strings(z["id_blob"], z["id_offsets"]),
+                json.loads(z["meta_blob"].tobytes().decode("utf-8")),
+                {t: i for i, t in enumerate(terms)},
+                z["indptr"],
+                z["postings"],
+                z["weights"],
+            )
+
+
+_FILENAME = "bm25.npz"
+_cache: IndexCache[BM25Index] = IndexCache(_FILENAME, BM25Index.load, SPARSE_INDEX_CACHE_SIZE)
+
+
+def save_sparse_index(namespace: str, index: BM25Index) -> None:
+    index.save(index_path(namespace, _FILENAME))
+
+
+def load_sparse_index(namespace: str) -> Optional[BM25Index]:
+    """
+    Load a namespace's BM25 index (LRU-cached, reloaded when the file changes).
+    """
+    return _cache.get(namespace)
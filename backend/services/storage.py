@@ -0,0 +1,13 @@
+import os
+
+# Root directory for everything PolicyPal persists locally (manifests, caches, indexes).
+DATA_DIR = os.getenv("POLICYPAL_DATA_DIR", os.path.join(os.getcwd(), ".policypal"))
+
+
+def data_path(*parts: str) -> str:
+    """
+    Resolve a path under DATA_DIR, creating parent directories as needed.
+    """
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -1,15 +1,127 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+# Break preference, strongest first (same order the old langchain splitter used)
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+# Page texts are joined like document_parser.extract_text, so offsets line up with it
+PAGE_JOINER = "\n"
+CHARS_PER_TOKEN = 4  # rough estimate for English prose
+_TRIM_AT = 1 << 16  # drop consumed text from the buffer once this much has piled up
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A chunk of document text; start/end are offsets into the joined page text."""
+    index: int
+    text: str
+    start: int
+    end: int
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+
+def _break_at(buf: str, lo: int, hi: int) -> int:
+    """
+    End of a chunk starting at lo and at most hi: just after the strongest
+    separator in the back half of the window, or hi if there is none.
+    """
+    floor = lo + (hi - lo) // 2
+    for sep in SEPARATORS:
+        i = buf.rfind(sep, floor, hi - len(sep) + 1)
+        if i != -1:
+            return i + len(sep)
+    return hi
+
+
+def _next_start(buf: str, start: int, end: int, overlap: int) -> int:
+    """
+    Start of the next chunk: just after the strongest separator in the last
+    `overlap` characters of this one, so the repeated text begins cleanly.
+    """
+    if overlap <= 0:
+        return end
+    lo = max(end - overlap, start + 1)
+    for sep in SEPARATORS:
+        i = buf.find(sep, lo, end)
+        if i != -1:
+            return i + len(sep)
+    return lo
+
+
+def iter_chunks(
+    pages: Union[str, Iterable[Tuple[int, str]]],
+    chunk_size: int = 1200,
+    chunk_overlap: int = 250,
+    unit: str = "chars",
+) -> Iterator[Chunk]:
+    """
+    Split text into overlapping chunks suitable for embedding and retrieval,
+    lazily: pages ([(page_number, text)] as from extract_pages, or one string)
+    are pulled only as the next chunk needs them.
+    Chunks break at the strongest separator available (paragraph, line,
+    sentence, word) and carry their offsets and the pages they span.
+    unit="tokens" sizes chunks by approximate tokens instead of characters.
+    """
+    if unit == "tokens":
+        chunk_size, chunk_overlap = chunk_size * CHARS_PER_TOKEN, chunk_overlap * CHARS_PER_TOKEN
+    elif unit != "chars":
+        raise ValueError(f"Unknown chunk size unit: {unit}")
+    if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+    source = iter([(None, pages)] if isinstance(pages, str) else pages)
+    buf, base = "", 0  # buf holds the joined text from absolute offset `base` on
+    page_offsets: List[int] = []  # absolute offset where each page starts
+    page_numbers: List[Optional[int]] = []
+    exhausted = False
+    pos = 0  # absolute start of the next chunk
+    index = 0
+
+    def page_at(offset: int) -> Optional[int]:
+        i = bisect_right(page_offsets, offset) - 1
+        return page_numbers[i] if i >= 0 else None
+
+    while True:
+        # Pull pages until the buffer covers a full chunk past pos (or input ends)
+        while not exhausted and base + len(buf) <= pos + chunk_size:
+            try:
+                page_no, text = next(source)
+            except StopIteration:
+                exhausted = True
+                break
+            if not text:
+                continue
+            if page_offsets:
+                buf += PAGE_JOINER
+            page_offsets.append(base + len(buf))
+            page_numbers.append(page_no)
+            buf += text
+
+        lo = pos - base
+        if base + len(buf) <= pos + chunk_size:
+            hi = len(buf)  # the rest fits in one chunk
+        else:
+            hi = _break_at(buf, lo, lo + chunk_size)
+
+        raw = buf[lo:hi]
+        text = raw.strip()
+        if text:
+            start = pos + (raw.find(text[0]) if raw[0].isspace() else 0)
+            end = start + len(text)
+            yield Chunk(index, text, start, end, page_at(start), page_at(end - 1))
+            index += 1
+
+        if hi >= len(buf) and exhausted:
+            return
+        pos = base + _next_start(buf, lo, hi, chunk_overlap)
+        if pos - base > _TRIM_AT:
+            buf, base = buf[pos - base:], pos
+
 
 def chunk_text(text: str, chunk_size: int = 1200, chunk_overlap: int = 250) -> list[str]:
     """
     Split text into overlapping chunks suitable for embedding and retrieval.
     Defaults are tuned for policy/contract prose.
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ". ", " "]
-    )
-    chunks = splitter.split_text(text)
-    # Trim empties / whitespace-only chunks
-    return [c.strip() for c in chunks if c.strip()]
+    return [c.text for c in iter_chunks(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)]
@@ -0,0 +1,165 @@
+import os
+from typing import Optional, Sequence
+
+import numpy as np
+
+CODECS = ("float32", "float16", "int8")
+# Encoding for vectors held and scored in-process (local vector store, semantic question cache)
+VECTOR_CODEC = os.getenv("VECTOR_CODEC", "int8").lower()
+
+_SCORE_BLOCK = 4096  # rows widened to float32 at a time while scoring
+_INT8_MAX = 127.0
+
+
+def _check(codec: str) -> str:
+    if codec not in CODECS:
+        raise ValueError(f"Unknown vector codec: {codec!r} (expected one of {', '.join(CODECS)})")
+    return codec
+
+
+class EncodedVectors:
+    """
+    Rows of vectors in a compact encoding:
+    float32 (as is), float16, or int8 with one float32 scale per row
+    (row ≈ codes * scale, where scale = max|row| / 127).
+    The codec follows from the dtype of `codes`; `scales` is only set for int8.
+    """
+
+    __slots__ = ("codes", "scales")
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def codec(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, rows) -> "EncodedVectors":
+        return EncodedVectors(self.codes[rows], None if self.scales is None else self.scales[rows])
+
+    def decode(self, rows=slice(None)) -> np.ndarray:
+        """float32 copy of the selected rows."""
+        codes = np.asarray(self.codes[rows], dtype=np.float32)
+        if self.scales is not None:
+            codes *= np.asarray(self.scales[rows], dtype=np.float32)[:, None]
+        return codes
+
+    def dot(self, query: np.ndarray) -> np.ndarray:
+        """
+        Row-by-query scores, computed on the encoded rows: blocks of codes are
+        widened to float32 for the matrix product and int8 scores are rescaled
+        afterwards, so the full float32 matrix never exists. `query` is a 1-D
+        vector or a (k, dim) matrix, giving (n,) or (n, k) scores.
+        """
+        q = np.asarray(query, dtype=np.float32)
+        qt = q if q.ndim == 1 else q.T
+        if self.codec == "float32":
+            return self.codes @ qt
+        n = len(self)
+        out = np.empty((n,) if q.ndim == 1 else (n, q.shape[0]), dtype=np.float32)
+        for start in range(0, n, _SCORE_BLOCK):
+            stop = min(n, start + _SCORE_BLOCK)
+            block = np.asarray(self.codes[start:stop], dtype=np.float32) @ qt
+            if self.scales is not None:
+                scales = np.asarray(self.scales[start:stop], dtype=np.float32)
+                block *= scales if q.ndim == 1 else scales[:, None]
+            out[start:stop] = block
+        return out
+
+    def take(self, rows) -> "EncodedVectors":
+        """In-memory copy of the selected rows (materializes mmap'd codes)."""
+        return EncodedVectors(
+            np.array(self.codes[rows]),
+            None if self.scales is None else np.array(self.scales[rows], dtype=np.float32),
+        )
+
+    def assign(self, rows, other: "EncodedVectors") -> None:
+        """Overwrite rows in place with rows of the same codec."""
+        self.codes[rows] = other.codes
+        if self.scales is not None:
+            self.scales[rows] = other.scales
+
+    @staticmethod
+    def empty(count: int, dim: int, codec: str = VECTOR_CODEC) -> "EncodedVectors":
+        codec = _check(codec)
+        return EncodedVectors(
+            np.zeros((count, dim), dtype=codec),
+            np.zeros(count, dtype=np.float32) if codec == "int8" else None,
+        )
+
+    @staticmethod
+    def concat(parts: Sequence["EncodedVectors"]) -> "EncodedVectors":
+        codes = np.concatenate([p.codes for p in parts])
+        scales = None if parts[0].scales is None else np.concatenate([p.scales for p in parts])
+        return EncodedVectors(codes, scales)
+
+
+def encode(vectors, codec: str = VECTOR_CODEC) -> EncodedVectors:
+    """Encode a (n, dim) array (or one 1-D vector as a single row)."""
+    codec = _check(codec)
+    x = np.asarray(vectors, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[None, :]
+    if codec != "int8":
+        return EncodedVectors(np.ascontiguousarray(x, dtype=codec))
+    scales = np.abs(x).max(axis=1) / _INT8_MAX if x.size else np.zeros(len(x), dtype=np.float32)
+    safe = np.where(scales == 0, 1.0, scales)[:, None]
+    codes = np.clip(np.rint(x / safe), -_INT8_MAX, _INT8_MAX).astype(np.int8)
+    return EncodedVectors(codes, scales.astype(np.float32))
+
+
+def as_codec(vectors: EncodedVectors, codec: str) -> EncodedVectors:
+    """`vectors` in `codec`, re-encoding (e.g. rows written before a codec change) only if needed."""
+    if vectors.codec == codec:
+        return vectors
+    return encode(vectors.decode(), codec)
+
+
+# --- Blobs: one encoded row as bytes (embedding cache) -----------------------
+
+def to_blob(vector, codec: str) -> bytes:
+    encoded = encode(vector, codec)
+    blob = encoded.codes.tobytes()
+    return blob + encoded.scales.tobytes() if encoded.scales is not None else blob
+
+
+def from_blob(blob: bytes, codec: str) -> np.ndarray:
+    """float32 vector from a to_blob() blob."""
+    if codec == "int8":
+        codes = np.frombuffer(blob, dtype=np.int8, count=len(blob) - 4)
+        return codes.astype(np.float32) * np.frombuffer(blob, dtype=np.float32, offset=len(blob) - 4)[0]
+    return np.frombuffer(blob, dtype=_check(codec)).astype(np.float32)
+
+
+def recall_at_k(vectors, queries, k: int = 10, codec: str = VECTOR_CODEC) -> float:
+    """
+    Fraction of the float32 top-k neighbours (by inner product) that scoring
+    the `codec`-encoded rows also returns, averaged over the queries. A row
+    tied with the float32 k-th best score counts as a hit, since any of the
+    tied rows is an equally right answer.
+    """
+    base = np.asarray(vectors, dtype=np.float32)
+    q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    k = min(k, len(base))
+    if k == 0 or len(q) == 0:
+        return 1.0
+    exact = base @ q.T
+    approx = encode(base, codec).dot(q)
+    hits = 0
+    for j in range(len(q)):
+        kth = np.partition(exact[:, j], len(base) - k)[len(base) - k]
+        got = np.argpartition(-approx[:, j], k - 1)[:k]
+        hits += int(np.count_nonzero(exact[got, j] >= kth - 1e-6))
+    return hits / (k * len(q))
@@ -0,0 +1,379 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.services.storage import DATA_DIR
+from backend.services.vector_codec import VECTOR_CODEC, EncodedVectors, as_codec, encode
+
+try:
+    import fcntl  # cross-process write lock (POSIX)
+except ImportError:  # pragma: no cover - Windows dev boxes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# "pinecone" (default) or "local"
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR") or os.path.join(DATA_DIR, "vectors")
+PINECONE_DELETE_BATCH = 1000  # Pinecone's limit on ids per delete request
+
+
+class VectorStore(ABC):
+    """
+    Minimal vector index interface used by ingestion and retrieval.
+    Vectors are {"id", "values", "metadata"} dicts; query results are
+    {"id", "score", "metadata"} dicts ordered by descending score.
+    """
+
+    name: str = "base"
+
+    @abstractmethod
+    def upsert(self, vectors: List[Dict], namespace: str) -> None: ...
+
+    @abstractmethod
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        namespace: str,
+        fltr: Optional[Dict] = None,
+    ) -> List[Dict]: ...
+
+    @abstractmethod
+    def delete(self, ids: List[str], namespace: str) -> None: ...
+
+    @abstractmethod
+    def delete_namespace(self, namespace: str) -> None: ...
+
+    @abstractmethod
+    def list_namespaces(self) -> List[str]: ...
+
+
+class PineconeVectorStore(VectorStore):
+    """Pinecone-backed store; the client is only created on first use."""
+
+    name = "pinecone"
+
+    @property
+    def _index(self):
+        from backend.services.pinecone_store import get_index  # deferred: pulls in the Pinecone SDK
+        return get_index()
+
+    def upsert(self, vectors: List[Dict], namespace: str) -> None:
+        # The client serializes plain lists; values may arrive as float32 arrays
+        vectors = [
+            {**v, "values": v["values"].tolist()} if isinstance(v["values"], np.ndarray) else v
+            for v in vectors
+        ]
+        for attempt in range(1, 4):
+            try:
+                self._index.upsert(vectors=vectors, namespace=namespace)
+                return
+            except Exception as e:
+                backoff = 2 ** (attempt - 1)
+                logger.warning(
+                    "Upsert attempt %s failed for namespace=%s: %s. Retrying in %s sec.",
+                    attempt,
+                    namespace,
+                    e,
+                    backoff,
+                )
+                time.sleep(backoff)
+        raise RuntimeError(f"Failed to upsert into Pinecone namespace={namespace}")
+
+    def query(self, vector, top_k, namespace, fltr=None) -> List[Dict]:
+        res = self._index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            include_values=False,
+            namespace=namespace,
+            filter=fltr,
+        )
+        # Normalize response across client versions
+        matches = getattr(res, "matches", None) or res.get("matches", [])
+        out = []
+        for m in matches:
+            if isinstance(m, dict):
+                out.append({"id": m.get("id"), "score": m.get("score"), "metadata": m.get("metadata") or {}})
+            else:
+                out.append({
+                    "id": getattr(m, "id", None),
+                    "score": getattr(m, "score", 0.0),
+                    "metadata": getattr(m, "metadata", None) or {},
+                })
+        return out
+
+    def delete(self, ids: List[str], namespace: str) -> None:
+        for i in range(0, len(ids), PINECONE_DELETE_BATCH):
+            self._index.delete(ids=ids[i: i + PINECONE_DELETE_BATCH], namespace=namespace)
+
+    def delete_namespace(self, namespace: str) -> None:
+        self._index.delete(delete_all=True, namespace=namespace)
+
+    def list_namespaces(self) -> List[str]:
+        stats = self._index.describe_index_stats()
+        namespaces = getattr(stats, "namespaces", None) or stats.get("namespaces", {})
+        return list(namespaces)
+
+
+class _Snapshot:
+    """One immutable generation of a namespace, memory-mapped read-only."""
+
+    def __init__(self, directory: str, generation: str):
+        self.generation = generation
+        codes = np.load(os.path.join(directory, f"vectors-{generation}.npy"), mmap_mode="r")
+        scales_path = os.path.join(directory, f"scales-{generation}.npy")
+        # int8 generations carry per-row scales; float32 (older) and float16 ones do not
+        scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+        self.vectors = EncodedVectors(codes, scales)
+        with open(os.path.join(directory, f"meta-{generation}.json"), encoding="utf-8") as f:
+            payload = json.load(f)
+        self.ids: List[str] = payload["ids"]
+        self.metadata: List[Dict] = payload["metadata"]
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def column(self, field: str) -> np.ndarray:
+        # Object array of one metadata field, built once per snapshot for vectorized filters
+        col = self._columns.get(field)
+        if col is None:
+            col = np.empty(len(self.metadata), dtype=object)
+            col[:] = [m.get(field) for m in self.metadata]
+            self._columns[field] = col
+        return col
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process store: per namespace, unit-normalized rows encoded with `codec`
+    (see vector_codec) in .npy files that every worker maps read-only, plus
+    ids/metadata in JSON. Queries are scored on the encoded rows.
+    Writers publish a new generation and atomically swap the CURRENT pointer,
+    so readers never see a half-written namespace. Generations written with
+    another codec stay readable and are re-encoded on the next write.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str = LOCAL_VECTOR_DIR, codec: str = VECTOR_CODEC):
+        self.root = root
+        self.codec = codec
+        os.makedirs(root, exist_ok=True)
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, namespace: str) -> str:
+        if not namespace or os.sep in namespace or namespace.startswith("."):
+            raise ValueError(f"Invalid namespace: {namespace!r}")
+        return os.path.join(self.root, namespace)
+
+    def _current_generation(self, directory: str) -> Optional[str]:
+        try:
+            with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _snapshot(self, namespace: str) -> Optional[_Snapshot]:
+        directory = self._dir(namespace)
+        generation = self._current_generation(directory)
+        while generation is not None:
+            with self._lock:
+                snap = self._snapshots.get(namespace)
+                if snap is not None and snap.generation == generation:
+                    return snap
+                try:
+                    snap = _Snapshot(directory, generation)
+                except FileNotFoundError:
+                    # A writer published a newer generation and removed this one
+                    # after we read CURRENT; follow the pointer again
+                    latest = self._current_generation(directory)
+                    if latest == generation:
+                        raise
+                    generation = latest
+                    continue
+                self._snapshots[namespace] = snap
+                return snap
+        return None
+
+    def _write_locked(self, namespace: str):
+        directory = self._dir(namespace)
+        os.makedirs(directory, exist_ok=True)
+        lock_file = open(os.path.join(directory, "LOCK"), "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return directory, lock_file
+
+    def _publish(self, directory: str, ids: List[str], metadata: List[Dict], vectors: EncodedVectors) -> None:
+        old = self._current_generation(directory)
+        generation = f"{time.time_ns():x}"
+        np.save(os.path.join(directory, f"vectors-{generation}.npy"), vectors.codes)
+        if vectors.scales is not None:
+            np.save(os.path.join(directory, f"scales-{generation}.npy"), vectors.scales)
+        with open(os.path.join(directory, f"meta-{generation}.json"), "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "metadata": metadata}, f)
+        tmp = os.path.join(directory, "CURRENT.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(generation)
+        os.replace(tmp, os.path.join(directory, "CURRENT"))
+        if old:
+            # Readers that already mapped the old files keep their mapping after unlink
+            for name in (f"vectors-{old}.npy", f"scales-{old}.npy", f"meta-{old}.json"):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def upsert(self, vectors: List[Dict], namespace: str) -> None:
+        if not vectors:
+            return
+        directory, lock_file = self._write_locked(namespace)
+        try:
+            snap = self._snapshot(namespace)
+            ids = list(snap.ids) if snap else []
+            metadata = list(snap.metadata) if snap else []
+            existing = as_codec(snap.vectors.take(slice(None)), self.codec) if snap else None
+            position = {vid: i for i, vid in enumerate(ids)}
+
+            new_rows = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+            norms = np.linalg.norm(new_rows, axis=1, keepdims=True)
+            new_rows /= np.where(norms == 0, 1.0, norms)
+            encoded = encode(new_rows, self.codec)
+
+            appended = []
+            replace_at, replace_rows = [], []
+            for row, v in enumerate(vectors):
+                i = position.get(v["id"])
+                if i is None:
+                    position[v["id"]] = len(ids)
+                    ids.append(v["id"])
+                    metadata.append(v.get("metadata") or {})
+                    appended.append(row)
+                else:
+                    metadata[i] = v.get("metadata") or {}
+                    replace_at.append(i)
+                    replace_rows.append(row)
+
+            if existing is None:
+                matrix = encoded[appended]
+            else:
+                if existing.dim != new_rows.shape[1]:
+                    raise ValueError(
+                        f"Dimension {new_rows.shape[1]} does not match namespace={namespace} ({existing.dim})"
+                    )
+                existing.assign(replace_at, encoded[replace_rows])
+                matrix = EncodedVectors.concat([existing, encoded[appended]])
+            self._publish(directory, ids, metadata, matrix)
+        finally:
+            lock_file.close()
+
+    def query(self, vector, top_k, namespace, fltr=None) -> List[Dict]:
+        snap = self._snapshot(namespace)
+        if snap is None or not snap.ids or top_k <= 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        q /= (np.linalg.norm(q) or 1.0)
+        scores = snap.vectors.dot(q)
+
+        candidates = None
+        if fltr:
+            mask = self._filter_mask(snap, fltr)
+            candidates = np.flatnonzero(mask)
+            scores = scores[candidates]
+        k = min(top_k, scores.shape[0])
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = candidates[top] if candidates is not None else top
+        return [
+            {"id": snap.ids[r], "score": float(scores[t]), "metadata": snap.metadata[r]}
+            for r, t in zip(rows.tolist(), top.tolist())
+        ]
+
+    @staticmethod
+    def _filter_mask(snap: _Snapshot, fltr: Dict[str, Any]) -> np.ndarray:
+        """Vectorized subset of Pinecone's filter language: field equality, $eq, $ne, $in."""
+        mask = np.ones(len(snap.ids), dtype=bool)
+        for field, cond in fltr.items():
+            col = snap.column(field)
+            if not isinstance(cond, dict):
+                cond = {"$eq": cond}
+            for op, value in cond.items():
+                if op == "$eq":
+                    mask &= col == value
+                elif op == "$ne":
+                    mask &= col != value
+                elif op == "$in":
+                    mask &= np.isin(col, list(value))
+                else:
+                    raise ValueError(f"Unsupported filter operator for local store: {op}")
+        return mask
+
+    def delete(self, ids: List[str], namespace: str) -> None:
+        if not ids:
+            return
+        directory, lock_file = self._write_locked(namespace)
+        try:
+            snap = self._snapshot(namespace)
+            if snap is None:
+                return
+            drop = set(ids)
+            keep = [i for i, vid in enumerate(snap.ids) if vid not in drop]
+            if len(keep) == len(snap.ids):
+                return
+            self._publish(
+                directory,
+                [snap.ids[i] for i in keep],
+                [snap.metadata[i] for i in keep],
+                snap.vectors.take(keep),
+            )
+        finally:
+            lock_file.close()
+
+    def delete_namespace(self, namespace: str) -> None:
+        shutil.rmtree(self._dir(namespace), ignore_errors=True)
+        with self._lock:
+            self._snapshots.pop(namespace, None)
+
+    def list_namespaces(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, "CURRENT"))
+        )
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """
+    Process-wide vector store selected by VECTOR_STORE.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if VECTOR_STORE == "local":
+                _store = LocalVectorStore()
+            elif VECTOR_STORE == "pinecone":
+                _store = PineconeVectorStore()
+            else:
+                raise ValueError(f"Unknown VECTOR_STORE: {VECTOR_STORE}")
+        return _store
+
+
+def set_vector_store(store: VectorStore) -> None:
+    """
+    Swap in a different store (e.g. a benchmark stand-in).
+    """
+    global _store
+    with _store_lock:
+        _store = store
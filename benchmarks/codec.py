@@ -0,0 +1,133 @@
+"""
+Vector codec benchmark: memory per vector, top-k recall against float32 and
+scoring time for each encoding in backend.services.vector_codec.
+
+    python -m benchmarks.codec --rows 20000 --dimension 768 --queries 200 --k 10
+    python -m benchmarks.codec --embedding-cache data/embeddings.sqlite3
+
+Datasets: "clustered" (unit vectors around random centres, shaped like dense
+text embeddings), "corpus" (benchmark policy clauses and questions through the
+fake Gemini embedder) and, with --embedding-cache, real cached embeddings with
+held-out rows as queries.
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from backend.services.vector_codec import CODECS, encode, from_blob, recall_at_k
+from benchmarks.corpus import _page_text, make_questions
+from benchmarks.fake_gemini import embed_text
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return (x / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+
+def clustered(rows: int, queries: int, dimension: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(1, rows // 50), dimension))
+
+    def sample(n: int) -> np.ndarray:
+        picked = centres[rng.integers(0, len(centres), n)]
+        return _unit(picked + 0.8 * rng.standard_normal((n, dimension)))
+
+    return sample(rows), sample(queries)
+
+
+def corpus(rows: int, queries: int, dimension: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = random.Random(seed)
+    clauses: List[str] = []
+    page = 0
+    while len(clauses) < rows:
+        page += 1
+        sentences = _page_text(rng, page).split(". ")
+        clauses += [". ".join(sentences[i: i + 3]) for i in range(0, len(sentences), 3)]
+    base = np.asarray([embed_text(c, dimension) for c in clauses[:rows]], dtype=np.float32)
+    qs = np.asarray([embed_text(q, dimension) for q in make_questions(queries, rng)], dtype=np.float32)
+    return base, qs
+
+
+def embedding_cache(path: str, queries: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+    codec_column = "codec" if "codec" in columns else "'float32'"
+    vectors = [from_blob(blob, codec) for blob, codec in conn.execute(f"SELECT vec, {codec_column} FROM embeddings")]
+    conn.close()
+    dims = {}
+    for v in vectors:
+        dims[len(v)] = dims.get(len(v), 0) + 1
+    dim = max(dims, key=dims.get)  # one model per run
+    data = _unit(np.asarray([v for v in vectors if len(v) == dim]))
+    np.random.default_rng(seed).shuffle(data)
+    held_out = min(queries, len(data) // 10)
+    if held_out == 0:
+        raise SystemExit(f"Too few embeddings in {path} ({len(data)})")
+    return data[held_out:], data[:held_out]
+
+
+def measure(base: np.ndarray, queries: np.ndarray, k: int) -> Dict[str, Dict]:
+    out = {}
+    exact = base @ queries.T
+    for codec in CODECS:
+        encoded = encode(base, codec)
+        t0 = time.perf_counter()
+        for q in queries:
+            encoded.dot(q)
+        per_query = (time.perf_counter() - t0) / len(queries)
+        error = np.abs(encoded.dot(queries) - exact)
+        out[codec] = {
+            "bytes_per_vector": encoded.nbytes / len(base),
+            "megabytes": encoded.nbytes / 1e6,
+            f"recall@{k}": recall_at_k(base, queries, k, codec),
+            "recall@1": recall_at_k(base, queries, 1, codec),
+            "max_score_error": float(error.max()),
+            "mean_score_error": float(error.mean()),
+            "ms_per_query": per_query * 1000,
+        }
+    return out
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="stored vectors (synthetic datasets)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--datasets", nargs="+", default=["clustered", "corpus"], choices=["clustered", "corpus"])
+    parser.add_argument("--embedding-cache", default=None, help="also measure on an embeddings.sqlite3 cache")
+    parser.add_argument("--out", default=None, help="results JSON path")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    datasets = {name: globals()[name](args.rows, args.queries, args.dimension, args.seed) for name in args.datasets}
+    if args.embedding_cache:
+        datasets["embedding_cache"] = embedding_cache(args.embedding_cache, args.queries, args.seed)
+
+    results = {}
+    for name, (base, queries) in datasets.items():
+        print(f"{name}: {base.shape[0]} vectors x {base.shape[1]} dims, {len(queries)} queries", flush=True)
+        results[name] = measure(base, queries, args.k)
+        for codec, r in results[name].items():
+            print(f"  {codec:<8} {r['bytes_per_vector']:7.0f} B/vector  {r['megabytes']:8.1f} MB  "
+                  f"recall@{args.k} {r[f'recall@{args.k}']:.4f}  recall@1 {r['recall@1']:.4f}  "
+                  f"max score error {r['max_score_error']:.4f}  {r['ms_per_query']:6.2f} ms/query", flush=True)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import random
+from dataclasses import dataclass
+from typing import List
+
+# name, format, pages (DOCX: paragraphs of roughly one page each)
+CORPUS_SIZES = {
+    "small": [("policy-small.pdf", "pdf", 5), ("policy-small.docx", "docx", 5)],
+    "medium": [("policy-medium.pdf", "pdf", 50), ("policy-medium.docx", "docx", 40)],
+    "large": [("policy-large.pdf", "pdf", 300)],
+}
+
+QUESTION_TEMPLATES = [
+    "What is the waiting period for {item}?",
+    "Is {item} covered under this policy?",
+    "What is the maximum amount payable for {item}?",
+    "How many days do I have to file a claim for {item}?",
+    "Are there any exclusions for {item}?",
+    "What documents are needed to claim {item}?",
+]
+
+ITEMS = [
+    "cataract surgery", "maternity expenses", "dental treatment", "organ donor expenses",
+    "ambulance charges", "day care procedures", "AYUSH treatment", "pre-existing diseases",
+    "room rent", "ICU charges", "domiciliary hospitalisation", "health check-ups",
+    "bariatric surgery", "mental illness", "modern treatments", "cumulative bonus",
+]
+
+CLAUSES = [
+    "The Company shall indemnify the Insured for {item} up to {amount} rupees per policy year.",
+    "Claims for {item} must be notified within {days} days of discharge from hospital.",
+    "A waiting period of {months} months applies to {item} from the first policy inception.",
+    "{item} is excluded if it arises from participation in hazardous sports.",
+    "Expenses for {item} are payable only when certified by a registered medical practitioner.",
+    "The following documents are required for {item}: claim form, discharge summary and original bills.",
+    "Co-payment of {pct} percent applies to {item} for insured persons above sixty years of age.",
+]
+
+
+@dataclass
+class CorpusDocument:
+    name: str
+    path: str
+    format: str
+    pages: int
+    bytes: int
+
+
+def _page_text(rng: random.Random, page: int) -> str:
+    lines = [f"Section {page}. Benefits and conditions"]
+    for _ in range(rng.randint(12, 18)):
+        item = rng.choice(ITEMS)
+        lines.append(rng.choice(CLAUSES).format(
+            item=item.capitalize() if rng.random() < 0.2 else item,
+            amount=rng.randrange(5000, 500000, 5000),
+            days=rng.choice([7, 15, 30, 45]),
+            months=rng.choice([12, 24, 36, 48]),
+            pct=rng.choice([10, 20, 30]),
+        ))
+    return " ".join(lines)
+
+
+def _write_pdf(path: str, pages: List[str]) -> None:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def _write_docx(path: str, pages: List[str]) -> None:
+    import docx
+
+    document = docx.Document()
+    for text in pages:
+        document.add_paragraph(text)
+    document.save(path)
+
+
+def build_corpus(directory: str, sizes: List[str], seed: int = 7) -> List[CorpusDocument]:
+    """
+    Generate (or reuse) synthetic policy documents of the requested sizes.
+    Content is deterministic for a given seed, so runs are comparable.
+    """
+    os.makedirs(directory, exist_ok=True)
+    out = []
+    for size in sizes:
+        for name, fmt, pages in CORPUS_SIZES[size]:
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                rng = random.Random(f"{seed}:{name}")
+                texts = [_page_text(rng, p) for p in range(1, pages + 1)]
+                (_write_pdf if fmt == "pdf" else _write_docx)(path, texts)
+            out.append(CorpusDocument(name, path, fmt, pages, os.path.getsize(path)))
+    return out
+
+
+def make_questions(count: int, rng: random.Random) -> List[str]:
+    return [rng.choice(QUESTION_TEMPLATES).format(item=rng.choice(ITEMS)) for _ in range(count)]
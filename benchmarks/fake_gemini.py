@@ -0,0 +1,239 @@
+"""
+Local stand-in for the Gemini APIs the app calls, plus a static file server
+for the benchmark corpus. Runs as its own process so its CPU work does not
+share the app's GIL:
+
+    python -m benchmarks.fake_gemini --port 8765 --files /tmp/corpus
+
+Endpoints:
+  POST /v1/models/<model>:batchEmbedContents         → hashed bag-of-words vectors
+  POST /v1beta/models/<model>:generateContent        → {"answers": [{"i": n, "answer": ...}]} as JSON text
+  POST /v1beta/models/<model>:streamGenerateContent  → same, streamed one answer at a time
+  GET  /files/<name>                                 → corpus documents
+Latency and error rates are configurable per API; --embed-quota-rpm answers
+embedding requests over a per-minute quota with 429 and Retry-After.
+"""
+import os
+import re
+import json
+import time
+import random
+import argparse
+import zlib
+import threading
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class FakeConfig:
+    dimension: int = 768
+    embed_latency_ms: float = 80.0  # per request
+    embed_per_item_ms: float = 0.5  # per text in the batch
+    embed_error_rate: float = 0.0  # fraction of requests answered with 503
+    embed_quota_rpm: float = 0.0  # requests per minute before answering 429; 0 = unlimited
+    retry_after_s: float = 0.0  # minimum Retry-After on a 429 (otherwise: until the window has room)
+    llm_ttft_ms: float = 400.0  # time to first token
+    llm_per_answer_ms: float = 120.0  # generation time per answer
+    llm_error_rate: float = 0.0
+    jitter: float = 0.2  # ± fraction of every delay
+    files: Optional[str] = None
+
+
+class _Quota:
+    """Sliding one-minute request window, like the real per-project quota."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._times = deque()
+
+    def wait(self, rpm: float) -> float:
+        """Admit a request (returns 0) or return seconds until the window has room."""
+        if rpm <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            while self._times and now - self._times[0] >= 60.0:
+                self._times.popleft()
+            if len(self._times) >= rpm:
+                return 60.0 - (now - self._times[0])
+            self._times.append(now)
+            return 0.0
+
+
+_embed_quota = _Quota()
+
+
+def _sleep_ms(ms: float, jitter: float) -> None:
+    if ms > 0:
+        time.sleep(ms * random.uniform(1 - jitter, 1 + jitter) / 1000.0)
+
+
+def embed_text(text: str, dimension: int) -> List[float]:
+    """
+    Deterministic hashed bag-of-words vector, so retrieval still ranks sensibly.
+    """
+    words = _WORD.findall(text.lower()) or [""]
+    slots = np.fromiter((zlib.crc32(w.encode()) % dimension for w in words), dtype=np.int64, count=len(words))
+    vec = np.bincount(slots, minlength=dimension).astype(np.float32) + 1e-3
+    vec /= np.linalg.norm(vec)
+    return vec.tolist()
+
+
+def fake_answers(prompt: str) -> List[str]:
+    """
+    One short answer per numbered question, taken from the best-overlapping
+    excerpt sentence, in the JSON shape the prompt asks for.
+    """
+    questions_part = prompt.split("Questions:", 1)[-1].split("Policy Excerpts:", 1)[0]
+    questions = re.findall(r"^\s*\d+\.\s+(.*)$", questions_part, re.M)
+    excerpts = prompt.split("Policy Excerpts:", 1)[-1]
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", excerpts) if len(s.strip()) > 20]
+    answers = []
+    for q in questions:
+        q_words = set(_WORD.findall(q.lower()))
+        best = max(sentences, key=lambda s: len(q_words & set(_WORD.findall(s.lower()))), default="")
+        answers.append(best[:200] or "I could not find this information in the document.")
+    return answers
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = FakeConfig()
+
+    def log_message(self, fmt, *args):  # keep benchmark output readable
+        pass
+
+    def _send_json(self, status: int, payload, headers: Optional[dict] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": {"code": status, "message": message, "status": "UNAVAILABLE"}})
+
+    def _send_throttled(self, wait: float) -> None:
+        delay = round(max(wait, self.config.retry_after_s), 1)
+        self._send_json(429, {"error": {
+            "code": 429,
+            "message": "Quota exceeded",
+            "status": "RESOURCE_EXHAUSTED",
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{delay:g}s"}],
+        }}, headers={"Retry-After": f"{delay:g}"})
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        cfg = self.config
+        if not self.path.startswith("/files/") or not cfg.files:
+            return self._send_error(404, "not found")
+        path = os.path.join(cfg.files, os.path.basename(self.path.split("?", 1)[0]))
+        if not os.path.isfile(path):
+            return self._send_error(404, "not found")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(1 << 16)
+                if not block:
+                    break
+                self.wfile.write(block)
+
+    def do_POST(self):
+        cfg = self.config
+        route = self.path.split("?", 1)[0]
+        payload = self._read_json()
+        if route.endswith(":batchEmbedContents"):
+            texts = [r["content"]["parts"][0]["text"] for r in payload.get("requests", [])]
+            wait = _embed_quota.wait(cfg.embed_quota_rpm)
+            if wait > 0:
+                return self._send_throttled(wait)
+            _sleep_ms(cfg.embed_latency_ms + cfg.embed_per_item_ms * len(texts), cfg.jitter)
+            if random.random() < cfg.embed_error_rate:
+                return self._send_error(503, "injected embedding error")
+            return self._send_json(200, {"embeddings": [{"values": embed_text(t, cfg.dimension)} for t in texts]})
+
+        if route.endswith(":generateContent") or route.endswith(":streamGenerateContent"):
+            prompt = "".join(p.get("text", "") for c in payload.get("contents", []) for p in c.get("parts", []))
+            answers = fake_answers(prompt)
+            _sleep_ms(cfg.llm_ttft_ms, cfg.jitter)
+            if random.random() < cfg.llm_error_rate:
+                return self._send_error(503, "injected LLM error")
+            if route.endswith(":generateContent"):
+                _sleep_ms(cfg.llm_per_answer_ms * len(answers), cfg.jitter)
+                tagged = [{"i": i + 1, "answer": a} for i, a in enumerate(answers)]
+                return self._send_json(200, _candidate(json.dumps({"answers": tagged})))
+            return self._stream_answers(answers)
+
+        self._send_error(404, "unknown route")
+
+    def _stream_answers(self, answers: List[str]) -> None:
+        # REST streaming responses are one JSON array, sent incrementally
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(data: str) -> None:
+            raw = data.encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(raw), raw))
+            self.wfile.flush()
+
+        pieces = ['{"answers": ['] + [
+            json.dumps({"i": i + 1, "answer": a}) + ("," if i < len(answers) - 1 else "") for i, a in enumerate(answers)
+        ] + ["]}"]
+        for i, piece in enumerate(pieces):
+            if 0 < i < len(pieces) - 1:
+                _sleep_ms(self.config.llm_per_answer_ms, self.config.jitter)
+            chunk(("[" if i == 0 else ",") + json.dumps(_candidate(piece)))
+        chunk("]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(port: int, config: FakeConfig) -> ThreadingHTTPServer:
+    FakeGeminiHandler.config = config
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGeminiHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    defaults = FakeConfig()
+    for name, value in vars(defaults).items():
+        if name == "files":
+            parser.add_argument("--files", default=None, help="directory served under /files/")
+        else:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    config = FakeConfig(**{k: v for k, v in vars(args).items() if k != "port"})
+    server = serve(args.port, config)
+    print(f"fake gemini listening on http://127.0.0.1:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
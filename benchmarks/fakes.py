@@ -0,0 +1,106 @@
+import time
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from backend.services.vector_store import LocalVectorStore, VectorStore
+
+
+class InMemoryVectorStore(VectorStore):
+    """
+    Pinecone stand-in for benchmarks: brute-force cosine search over numpy rows
+    held in memory, with optional per-call latency to mimic network round trips.
+    Filters use the local store's subset of Pinecone's filter language.
+    """
+
+    name = "memory"
+
+    def __init__(self, upsert_latency_ms: float = 0.0, query_latency_ms: float = 0.0):
+        self.upsert_latency_ms = upsert_latency_ms
+        self.query_latency_ms = query_latency_ms
+        self._namespaces: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _wait(ms: float) -> None:
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+    def upsert(self, vectors: List[Dict], namespace: str) -> None:
+        self._wait(self.upsert_latency_ms)
+        with self._lock:
+            ns = self._namespaces.setdefault(namespace, {"rows": {}, "snapshot": None})
+            for v in vectors:
+                values = np.array(v["values"], dtype=np.float32)
+                values /= (np.linalg.norm(values) or 1.0)
+                ns["rows"][v["id"]] = (values, v.get("metadata") or {})
+            ns["snapshot"] = None
+
+    def _snapshot(self, namespace: str):
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or not ns["rows"]:
+                return None
+            if ns["snapshot"] is None:
+                ids = list(ns["rows"])
+                snap = _Columns(
+                    ids,
+                    [ns["rows"][i][1] for i in ids],
+                    np.stack([ns["rows"][i][0] for i in ids]),
+                )
+                ns["snapshot"] = snap
+            return ns["snapshot"]
+
+    def query(self, vector, top_k, namespace, fltr=None) -> List[Dict]:
+        self._wait(self.query_latency_ms)
+        snap = self._snapshot(namespace)
+        if snap is None or top_k <= 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        q /= (np.linalg.norm(q) or 1.0)
+        scores = snap.vectors @ q
+        rows = np.arange(len(snap.ids))
+        if fltr:
+            rows = np.flatnonzero(LocalVectorStore._filter_mask(snap, fltr))
+            scores = scores[rows]
+        order = np.argsort(-scores)[:top_k]
+        return [
+            {"id": snap.ids[rows[i]], "score": float(scores[i]), "metadata": snap.metadata[rows[i]]}
+            for i in order.tolist()
+        ]
+
+    def delete(self, ids: List[str], namespace: str) -> None:
+        self._wait(self.upsert_latency_ms)
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is not None:
+                for vid in ids:
+                    ns["rows"].pop(vid, None)
+                ns["snapshot"] = None
+
+    def delete_namespace(self, namespace: str) -> None:
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+
+    def list_namespaces(self) -> List[str]:
+        with self._lock:
+            return sorted(self._namespaces)
+
+
+class _Columns:
+    """Read-only view shaped like the local store's snapshot, so its filter code applies."""
+
+    def __init__(self, ids: List[str], metadata: List[Dict], vectors: np.ndarray):
+        self.ids = ids
+        self.metadata = metadata
+        self.vectors = vectors
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def column(self, field: str) -> np.ndarray:
+        col = self._columns.get(field)
+        if col is None:
+            col = np.empty(len(self.metadata), dtype=object)
+            col[:] = [m.get(field) for m in self.metadata]
+            self._columns[field] = col
+        return col
@@ -0,0 +1,307 @@
+"""
+Offline benchmark: ingestion throughput and /api/v1/hackrx/run latency under
+concurrent load, against local stand-ins for Gemini (benchmarks.fake_gemini,
+in its own process) and Pinecone (benchmarks.fakes.InMemoryVectorStore).
+
+    python -m benchmarks.run --sizes small medium --requests 60 --concurrency 8
+
+Results are printed and written as JSON (default benchmarks/results/<time>.json)
+so runs can be compared over time.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Dict, List
+
+from benchmarks.corpus import CORPUS_SIZES, build_corpus, make_questions
+from benchmarks.fake_gemini import FakeConfig
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BEARER_TOKEN = "benchmark-token"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        # nearest-rank
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "max": ordered[-1],
+    }
+
+
+def start_fake_gemini(port: int, config: FakeConfig) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "benchmarks.fake_gemini", "--port", str(port)]
+    for name, value in asdict(config).items():
+        if value is not None:
+            cmd += [f"--{name.replace('_', '-')}", str(value)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL)
+    _wait_for_port(port)
+    return proc
+
+
+def configure_environment(args, fake_url: str, data_dir: str) -> None:
+    """
+    The app reads its configuration at import time, so this runs before any app import.
+    """
+    os.environ.update({
+        "POLICYPAL_DATA_DIR": data_dir,
+        "GEMINI_EMBD_KEY": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+        "GEMINI_EMBED_URL": f"{fake_url}/v1/models/embedding-001:batchEmbedContents",
+        "GEMINI_API_ENDPOINT": fake_url,
+        "EMBEDDING_DIMENSION": str(args.dimension),
+        "BEARER_TOKEN": BEARER_TOKEN,
+        "PINECONE_API_KEY": "benchmark",
+    })
+    if not args.warm_caches:
+        # Measure the full pipeline: no answer reuse across requests
+        os.environ.update({
+            "ANSWER_CACHE_MAX_ITEMS": "0",
+            "ANSWER_CACHE_PERSIST": "0",
+            "SEMANTIC_CACHE_THRESHOLD": "2",
+        })
+
+
+async def bench_ingestion(urls: Dict[str, str], docs) -> List[Dict]:
+    from backend.services.ingestion import ingest_document_async
+
+    results = []
+    for doc in docs:
+        marks = {}
+        t0 = time.perf_counter()
+
+        def progress(stage: str, **details) -> None:
+            marks[stage] = (time.perf_counter(), details)
+
+        await ingest_document_async(urls[doc.name], progress=progress)
+        cold = time.perf_counter() - t0
+
+        t1 = time.perf_counter()
+        await ingest_document_async(urls[doc.name])
+        warm = time.perf_counter() - t1
+
+        downloaded = marks["downloaded"][0]
+        extracted = marks["extracted"][0]
+        searchable = marks["searchable"][0]
+        indexed, info = marks["indexed"]
+        chunks = info.get("chunks", 0)
+        results.append({
+            "document": doc.name,
+            "format": doc.format,
+            "pages": doc.pages,
+            "bytes": doc.bytes,
+            "chunks": chunks,
+            "seconds": cold,
+            "stages": {
+                "download": downloaded - t0,
+                "extract": extracted - downloaded,
+                "chunk_and_text_index": searchable - extracted,
+                "embed_and_upsert": indexed - searchable,
+            },
+            "chunks_per_second": chunks / cold if cold else None,
+            "pages_per_second": doc.pages / cold if cold else None,
+            "megabytes_per_second": doc.bytes / 1e6 / cold if cold else None,
+            "repeat_ingest_seconds": warm,
+        })
+        print(f"  ingest {doc.name:<22} {cold:7.2f}s  {chunks:5d} chunks  repeat {warm * 1000:6.1f}ms", flush=True)
+    return results
+
+
+def start_app(port: int):
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    _wait_for_port(port)
+    return server, thread
+
+
+def bench_load(app_url: str, urls: Dict[str, str], args) -> Dict:
+    import requests
+
+    rng = random.Random(args.seed)
+    jobs = [
+        (urls[rng.choice(sorted(urls))], make_questions(args.questions, rng))
+        for _ in range(args.requests)
+    ]
+    local = threading.local()
+
+    def one(job) -> Dict:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        document, questions = job
+        t0 = time.perf_counter()
+        try:
+            resp = session.post(
+                f"{app_url}/api/v1/hackrx/run",
+                json={"documents": document, "questions": questions},
+                headers={"Authorization": f"Bearer {BEARER_TOKEN}"},
+                timeout=args.timeout,
+            )
+            body = resp.json() if resp.status_code == 200 else {}
+            ok = len(body.get("answers", [])) == len(questions)
+            degraded = len((body.get("metadata") or {}).get("degraded", []))
+            status = resp.status_code
+        except Exception as e:
+            ok, status, degraded = False, type(e).__name__, 0
+        return {"seconds": time.perf_counter() - t0, "ok": ok, "status": status, "degraded": degraded}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(one, jobs))
+    wall = time.perf_counter() - started
+
+    latencies = [o["seconds"] for o in outcomes if o["ok"]]
+    errors: Dict[str, int] = {}
+    for o in outcomes:
+        if not o["ok"]:
+            errors[str(o["status"])] = errors.get(str(o["status"]), 0) + 1
+    return {
+        "requests": len(outcomes),
+        "concurrency": args.concurrency,
+        "questions_per_request": args.questions,
+        "wall_seconds": wall,
+        "requests_per_second": len(outcomes) / wall if wall else None,
+        "latency_seconds": percentiles(latencies),
+        "degraded_answers": sum(o["degraded"] for o in outcomes),
+        "errors": errors,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=sorted(CORPUS_SIZES))
+    parser.add_argument("--requests", type=int, default=40, help="load test requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent load test clients")
+    parser.add_argument("--questions", type=int, default=10, help="questions per request")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--vector-store", choices=["memory", "local"], default="memory")
+    parser.add_argument("--store-latency-ms", type=float, default=20.0, help="in-memory store per-call latency")
+    parser.add_argument("--warm-caches", action="store_true", help="let answer caches serve repeat questions")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "policypal-bench-corpus"))
+    parser.add_argument("--data-dir", default=None, help="app data dir (default: fresh temp dir)")
+    parser.add_argument("--out", default=None, help="results JSON path")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logging")
+    fake = parser.add_argument_group("fake Gemini")
+    for name, value in asdict(FakeConfig()).items():
+        if name != "files":
+            fake.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    fake_config = FakeConfig(**{k: getattr(args, k) for k in asdict(FakeConfig()) if k != "files"})
+
+    print("Building corpus...", flush=True)
+    docs = build_corpus(args.corpus_dir, args.sizes, seed=args.seed)
+    fake_config.files = os.path.abspath(args.corpus_dir)
+
+    fake_port, app_port = _free_port(), _free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="policypal-bench-")
+    fake = start_fake_gemini(fake_port, fake_config)
+    try:
+        configure_environment(args, fake_url, data_dir)
+        from backend.services.vector_store import LocalVectorStore, set_vector_store
+        from benchmarks.fakes import InMemoryVectorStore
+
+        if args.vector_store == "memory":
+            set_vector_store(InMemoryVectorStore(args.store_latency_ms, args.store_latency_ms))
+        else:
+            set_vector_store(LocalVectorStore(os.path.join(data_dir, "vectors")))
+        urls = {doc.name: f"{fake_url}/files/{doc.name}" for doc in docs}
+
+        server, thread = start_app(app_port)
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        print("Ingestion:", flush=True)
+        ingestion = asyncio.run(bench_ingestion(urls, docs))
+
+        print(f"Load: {args.requests} requests x {args.questions} questions, concurrency {args.concurrency}", flush=True)
+        load = bench_load(f"http://127.0.0.1:{app_port}", urls, args)
+        lat = load["latency_seconds"]
+        if lat:
+            print(f"  p50 {lat['p50']:.2f}s  p95 {lat['p95']:.2f}s  p99 {lat['p99']:.2f}s  "
+                  f"{load['requests_per_second']:.2f} req/s  errors {sum(load['errors'].values())}  "
+                  f"degraded answers {load['degraded_answers']}", flush=True)
+
+        from backend.services.embedding import embedding_client
+
+        embedding = embedding_client.stats()
+        server.should_exit = True
+        thread.join(timeout=10)
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {**vars(args), "fake_gemini": asdict(fake_config)},
+        "ingestion": ingestion,
+        "load": load,
+        "embedding_client": embedding,
+    }
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.app.routes import router as pipeline_router
+from backend.app.health import router as health_router, track_requests
 from dotenv import load_dotenv
-import os 
+import os
+import logging
 
 load_dotenv()
-
-load_dotenv()  
-print("ENV token loaded:", os.getenv("BEARER_TOKEN"))
+if not os.getenv("BEARER_TOKEN"):
+    logging.getLogger(__name__).warning("BEARER_TOKEN is not set; authenticated routes will reject every request")
 app = FastAPI(
     title="Policy QA Pipeline",
     description="Extracts document text and answers user questions using a retrieval-augmented QA system.",
@@ -22,6 +23,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(track_requests)
 
 # ✅ Updated prefix to match HackRx requirement
-app.include_router(pipeline_router, prefix="/api/v1", tags=["Pipeline"])
\ No newline at end of file
+app.include_router(pipeline_router, prefix="/api/v1", tags=["Pipeline"])
+app.include_router(health_router, tags=["Health"])
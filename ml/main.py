@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List
-from ml.pipeline.pipeline_qa import answer_questions
+from ml.pipeline.pipeline_qa import answer_questions_async
 
 app = FastAPI(
     title="ML QA Microservice",
@@ -18,9 +18,9 @@ class QAResponse(BaseModel):
     answers: List[str]
 
 @app.post("/answer-questions", response_model=QAResponse)
-def get_answers(payload: QARequest):
+async def get_answers(payload: QARequest):
     try:
-        answers = answer_questions(
+        answers = await answer_questions_async(
             document_url=payload.document_url,
             questions=payload.questions,
             top_k=payload.top_k
@@ -1,22 +1,292 @@
 import os
-import google.generativeai as genai
-from typing import Union
+import time
+import asyncio
+import logging
+import threading
+from typing import AsyncIterator, Iterator, List, Optional
+
+import requests
+
+from backend.services.concurrency import run_io
+from backend.services.metrics import LLM_CALLS, LLM_CIRCUIT_OPEN, LLM_HEDGES
+
+logger = logging.getLogger(__name__)
 
 # Load Gemini API key from environment variable
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+LLM_MODEL = "gemini-pro"
+# e.g. http://127.0.0.1:8765 for the benchmark stand-in; switches the SDK to its REST transport
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+# Seconds until the first streamed piece, and for the whole generation
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "20"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Start a duplicate request if the first piece takes longer than this; 0 = never
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+# Consecutive failures that open the circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class LLMError(RuntimeError):
+    """Gemini generation failed; callers fall back instead of treating it as an answer."""
+
+
+class LLMTimeoutError(LLMError):
+    """No first piece, or no complete response, within the configured timeout."""
+
+
+class BudgetExceededError(LLMTimeoutError):
+    """The caller's time budget ran out before Gemini's own timeouts; says nothing about Gemini's health."""
+
+
+class CircuitOpenError(LLMError):
+    """Gemini is failing; calls are rejected without being made until the cooldown ends."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures and rejects calls for
+    `cooldown` seconds, then lets a single trial call through (half-open):
+    success closes the circuit, failure opens it for another cooldown.
+    """
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.failures = max(1, failures)
+        self.cooldown = cooldown
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None and (
+                self._trial or time.monotonic() - self._opened_at < self.cooldown
+            )
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial or time.monotonic() - self._opened_at < self.cooldown:
+                LLM_CALLS.inc(outcome="rejected")
+                raise CircuitOpenError("Gemini circuit open; failing fast")
+            self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._trial = False
+            if self._opened_at is not None:
+                self._opened_at = None
+                logger.info("✅ Gemini circuit closed")
+        LLM_CIRCUIT_OPEN.set(0)
+
+    def release(self) -> None:
+        """The call ended without an outcome (e.g. the caller went away); allow another trial."""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if not self._trial and (self._opened_at is not None or self._consecutive < self.failures):
+                return  # below the threshold, or a call that started before the circuit opened
+            self._trial = False
+            self._opened_at = time.monotonic()
+        logger.warning("🔌 Gemini circuit open for %.0fs after %d failures", self.cooldown, self._consecutive)
+        LLM_CIRCUIT_OPEN.set(1)
+
+
+llm_breaker = CircuitBreaker()
+
+
+def _request_options(timeout: float) -> dict:
+    # The SDK's own retries would sit on a 503 for minutes; hedging, the breaker
+    # and the heuristic fallback handle failures instead. Its transport timeout
+    # only bounds the pool thread, so it trails ours.
+    return {"timeout": timeout + 5, "retry": None}
+
 
-# Configure Gemini model
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-pro")
+def _as_llm_error(e: Exception) -> LLMError:
+    if isinstance(e, (TimeoutError, requests.exceptions.Timeout)) or type(e).__name__ == "DeadlineExceeded":
+        return LLMTimeoutError(f"Gemini timed out: {e}")
+    return LLMError(f"Gemini generation failed: {e}")
 
-def call_gemini_llm(prompt: str) -> str:
+
+# The SDK is heavy to import, so the model is configured on first use
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+
+                if GEMINI_API_ENDPOINT:
+                    genai.configure(
+                        api_key=GEMINI_API_KEY,
+                        transport="rest",
+                        client_options={"api_endpoint": GEMINI_API_ENDPOINT},
+                    )
+                else:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                _model = genai.GenerativeModel(LLM_MODEL)
+    return _model
+
+
+def _iter_gemini_stream(prompt: str, stop: threading.Event, timeout: float) -> Iterator[str]:
+    response = _get_model().generate_content(prompt, stream=True, request_options=_request_options(timeout))
+    for chunk in response:
+        if stop.is_set():
+            return
+        text = chunk.text
+        if text:
+            yield text
+
+
+class _StreamAttempt:
     """
-    Sends a prompt string to Gemini and returns the plain text response.
-    Assumes prompt is already fully formatted.
+    One streamed generation: the blocking SDK iterator runs on the shared I/O
+    pool and hands pieces to the event loop through a queue.
     """
+
+    _DONE = object()
+
+    def __init__(self, prompt: str, timeout: float):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._stop = threading.Event()
+        self.reader = asyncio.ensure_future(run_io(self._pump, prompt, timeout))
+
+    def _put(self, item) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:  # event loop already closed
+            self._stop.set()
+
+    def _pump(self, prompt: str, timeout: float) -> None:
+        try:
+            for piece in _iter_gemini_stream(prompt, self._stop, timeout):
+                self._put(piece)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._put(self._DONE)
+
+    async def next(self) -> Optional[str]:
+        """Next piece, or None at the end; SDK errors are raised as LLMError."""
+        item = await self._queue.get()
+        if item is self._DONE:
+            return None
+        if isinstance(item, Exception):
+            raise _as_llm_error(item) from item
+        return item
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+async def _first_piece(attempts: List[_StreamAttempt], timeout: float):
+    """
+    Wait for whichever attempt produces its first piece first. Returns
+    (attempt, piece), or (None, None) if the timeout passes first; an attempt
+    that fails is dropped while others are still running.
+    """
+    waiting = {asyncio.ensure_future(a.next()): a for a in attempts}
+    deadline = time.monotonic() + timeout
+    error: Optional[LLMError] = None
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        # Optional: You could raise the error if you want the pipeline to fail loudly
-        return f"Error calling Gemini API: {str(e)}"
+        while waiting:
+            done, _ = await asyncio.wait(
+                waiting, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                return None, None
+            for task in done:
+                attempt = waiting.pop(task)
+                try:
+                    return attempt, task.result()
+                except LLMError as e:
+                    error = e
+        raise error
+    finally:
+        for task in waiting:
+            task.cancel()
+
+
+async def stream_gemini_llm_async(
+    prompt: str,
+    first_token_timeout: float = LLM_FIRST_TOKEN_TIMEOUT,
+    timeout: float = LLM_TIMEOUT,
+    hedge_after: float = LLM_HEDGE_AFTER,
+    budget: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    Yields Gemini's response text piece by piece as it is generated.
+
+    Raises CircuitOpenError without calling Gemini while the circuit is open,
+    LLMTimeoutError when the first piece or the whole response is late, and
+    LLMError for anything else. `budget` (the caller's remaining time) caps
+    both timeouts; running out of it raises BudgetExceededError, which unlike
+    Gemini's own timeouts does not count against the circuit breaker.
+    With hedge_after > 0, a duplicate request is started if the first piece
+    has not arrived by then; whichever answers first is used and the other is
+    dropped. Closing the iterator early stops reading the response.
+    """
+    llm_breaker.before_call()
+    started = time.monotonic()
+
+    def late(limit: float, message: str) -> LLMTimeoutError:
+        if budget is not None and budget < limit:
+            return BudgetExceededError(f"{message} within the {budget:.1f}s left of the request budget")
+        return LLMTimeoutError(f"{message} within {limit:.1f}s")
+
+    if budget is not None:
+        first_token_limit, total_limit = min(first_token_timeout, budget), min(timeout, budget)
+    else:
+        first_token_limit, total_limit = first_token_timeout, timeout
+    attempts = [_StreamAttempt(prompt, total_limit)]
+    try:
+        hedging = 0 < hedge_after < first_token_limit
+        winner, piece = await _first_piece(attempts, hedge_after if hedging else first_token_limit)
+        if winner is None and hedging:
+            attempts.append(_StreamAttempt(prompt, total_limit))
+            winner, piece = await _first_piece(attempts, first_token_limit - (time.monotonic() - started))
+            if winner is not None:
+                LLM_HEDGES.inc(winner="primary" if winner is attempts[0] else "hedge")
+        if winner is None:
+            raise late(first_token_timeout, "No response from Gemini")
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.close()
+
+        while piece is not None:
+            yield piece
+            remaining = total_limit - (time.monotonic() - started)
+            try:
+                piece = await asyncio.wait_for(winner.next(), max(0.0, remaining))
+            except asyncio.TimeoutError:
+                raise late(timeout, "Gemini response not complete") from None
+    except BudgetExceededError:
+        llm_breaker.release()
+        LLM_CALLS.inc(outcome="budget")
+        raise
+    except LLMError as e:
+        llm_breaker.record_failure()
+        LLM_CALLS.inc(outcome="timeout" if isinstance(e, LLMTimeoutError) else "error")
+        raise
+    except BaseException:  # closed or cancelled by the consumer
+        llm_breaker.release()
+        raise
+    else:
+        llm_breaker.record_success()
+        LLM_CALLS.inc(outcome="ok")
+    finally:
+        for attempt in attempts:
+            attempt.close()
@@ -1,85 +1,451 @@
+import os
+import asyncio
 import hashlib
 import json
-from typing import List
+import re
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from backend.services.retrieval import semantic_search  # your retrieval
-from ml.model.gemini_client import call_gemini_llm  # ✅ changed to Gemini
-from ml.pipeline.prompt_builder import build_llm_prompt  # prompt builder
+from backend.services.retrieval import semantic_search_many_async  # your retrieval
+from backend.services.embedding import aget_embeddings
+from ml.model.gemini_client import (  # ✅ changed to Gemini
+    LLM_MODEL,
+    CircuitOpenError,
+    LLMError,
+    LLMTimeoutError,
+    llm_breaker,
+    stream_gemini_llm_async,
+)
+from ml.pipeline.prompt_builder import PROMPT_VERSION, build_llm_prompt  # prompt builder
 from backend.services.qa import answer_one_question  # heuristic fallback
+from backend.services.sentence_index import load_sentence_index
+from backend.services.answer_cache import answer_cache, answer_key, normalize_question
+from backend.services.question_cache import question_cache
+from backend.services import manifest
+from backend.services.concurrency import run_io
+from backend.services.metrics import ANSWERS, span
+from backend.services.deadline import FALLBACK_RESERVE_SECONDS, LLM_MIN_SECONDS, Deadline
 
+logger = logging.getLogger(__name__)
 
-def answer_questions(
-    document_url: str,
-    questions: List[str],
-    top_k: int = 8,
-) -> List[str]:
+# Upper bound on distinct chunks shared by all questions in one prompt
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "24"))
+# "dense", "sparse" or "hybrid" (see backend.services.retrieval)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Questions per LLM prompt; larger batches are split and generated concurrently
+SHARD_SIZE = max(1, int(os.getenv("SHARD_SIZE", "8")))
+# Process-wide cap on in-flight Gemini generations
+LLM_CONCURRENCY = max(1, int(os.getenv("LLM_CONCURRENCY", "4")))
+
+# asyncio primitives belong to one event loop; sync callers run a fresh loop each time
+_llm_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _llm_slots.get(loop)
+    if sem is None:
+        sem = _llm_slots[loop] = asyncio.Semaphore(LLM_CONCURRENCY)
+    return sem
+
+
+@asynccontextmanager
+async def _llm_slot(deadline: Optional[Deadline] = None):
     """
-    Full question-answer pipeline: retrieval + LLM + fallback.
-    Returns a list of answers aligned with `questions`.
+    One of the LLM_CONCURRENCY slots; with a deadline, gives up (LLMTimeoutError)
+    once waiting longer would leave too little time to generate.
     """
-    source_id = hashlib.md5(document_url.encode()).hexdigest()
-    namespace = source_id  # you used namespace-per-document in upsert
+    sem = _llm_semaphore()
+    if deadline is None:
+        await sem.acquire()
+    else:
+        try:
+            await asyncio.wait_for(sem.acquire(), deadline.available(FALLBACK_RESERVE_SECONDS + LLM_MIN_SECONDS))
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError("No Gemini slot free within the request budget") from None
+    try:
+        yield
+    finally:
+        sem.release()
+
+
+def _merge_contexts(per_question: List[List[Dict]], max_chunks: int = CONTEXT_MAX_CHUNKS) -> List[Dict]:
+    """
+    Interleave per-question results rank by rank (every question's best chunk
+    first), dropping duplicates, until the shared budget is full.
+    """
+    merged: List[Dict] = []
+    seen = set()
+    depth = max((len(r) for r in per_question), default=0)
+    for rank in range(depth):
+        for results in per_question:
+            if rank >= len(results):
+                continue
+            chunk = results[rank]
+            key = chunk.get("id") or chunk.get("text")
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(chunk)
+            if len(merged) >= max_chunks:
+                return merged
+    return merged
+
+
+async def _heuristic_answers(questions: List[str], per_question: List[List[Dict]], namespace: str) -> List[str]:
+    with span("fallback"):
+        index = await run_io(load_sentence_index, namespace)
+        return [answer_one_question(q, r, index=index) for q, r in zip(questions, per_question)]
 
-    # 1. Retrieve shared context for all questions (shared chunks)
-    combined_query = " ".join(questions)
-    context_chunks = semantic_search(
-        combined_query,
-        top_k=top_k,
-        namespace=namespace,
-        fltr={"source": {"$eq": source_id}},
-    )
 
-    # 2. Build prompt for Gemini
-    prompt = build_llm_prompt(context_chunks, questions)
+class _AnswerStreamParser:
+    """
+    Pulls complete {"i": <question number>, "answer": "..."} elements out of a
+    partially received {"answers": [...]} JSON document as their closing
+    braces arrive; `closed` is set once the array ends. Text before the key
+    (e.g. a ```json fence) is ignored. Elements that are not such objects are
+    skipped; anything that is not an object at all (a bare number could still
+    be growing) stops the stream of answers.
+    """
+
+    _decoder = json.JSONDecoder()
+    _start = re.compile(r'"answers"\s*:\s*\[')
+
+    def __init__(self):
+        self._buf = ""
+        self._pos: Optional[int] = None  # just inside the array once found
+        self.closed = False
+        self.malformed = False
+
+    def feed(self, text: str) -> List[Tuple[int, str]]:
+        self._buf += text
+        out: List[Tuple[int, str]] = []
+        if self._pos is None:
+            m = self._start.search(self._buf)
+            if not m:
+                return out
+            self._pos = m.end()
+        buf = self._buf
+        while not (self.closed or self.malformed):
+            while self._pos < len(buf) and buf[self._pos] in " \t\r\n,":
+                self._pos += 1
+            if self._pos >= len(buf):
+                break
+            if buf[self._pos] == "]":
+                self.closed = True
+                break
+            if buf[self._pos] != "{":
+                self.malformed = True
+                break
+            try:
+                value, self._pos = self._decoder.raw_decode(buf, self._pos)
+            except json.JSONDecodeError:
+                break  # element still incomplete; wait for more text
+            number, answer = value.get("i"), value.get("answer")
+            if isinstance(number, int) and not isinstance(number, bool) and isinstance(answer, str):
+                out.append((number, answer))
+            else:
+                logger.warning("Skipping malformed answer element: %.200r", value)
+        return out
+
+
+def _shards(n: int, size: int = SHARD_SIZE) -> List[range]:
+    """
+    Split n questions into contiguous, evenly sized shards of at most `size`.
+    """
+    if n == 0:
+        return []
+    count = -(-n // size)
+    base, extra = divmod(n, count)
+    shards, start = [], 0
+    for i in range(count):
+        stop = start + base + (1 if i < extra else 0)
+        shards.append(range(start, stop))
+        start = stop
+    return shards
 
-    # 3. Call Gemini LLM
+
+async def _stream_shard(
+    questions: List[str],
+    per_question: List[List[Dict]],
+    namespace: str,
+    deadline: Optional[Deadline] = None,
+) -> AsyncIterator[Tuple[int, str, bool]]:
+    """
+    One prompt + one streamed Gemini call for a shard of questions.
+    Yields (index within shard, answer, True if from the LLM) as each answer
+    arrives. Answers carry their question number, so one missing, duplicated
+    or out-of-range element only costs its own question: whatever Gemini did
+    not answer (error, truncation, malformed JSON, or no time left in the
+    deadline) is answered by the heuristic fallback afterwards.
+    """
+    # 1. Merge the shard's per-question results into shared context, build prompt
+    with span("prompt_build"):
+        prompt = build_llm_prompt(_merge_contexts(per_question), questions)
+
+    # 2. Stream Gemini's output, bounded across all requests, yielding answers as they close
+    # (skipped while the circuit is open, without queueing for a slot)
+    parser = _AnswerStreamParser()
+    answered = [False] * len(questions)
+    started = False
     try:
-        raw_response = call_gemini_llm(prompt)
-    except Exception:
-        # Gemini call failed: fallback to heuristics
-        return [
-            answer_one_question(
-                q,
-                semantic_search(
-                    q,
-                    top_k=top_k,
-                    namespace=namespace,
-                    fltr={"source": {"$eq": source_id}},
-                ),
+        if llm_breaker.is_open:
+            raise CircuitOpenError("Gemini circuit open")
+        async with _llm_slot(deadline):
+            budget = None
+            if deadline is not None:
+                budget = deadline.llm_time()
+                if not budget:
+                    raise LLMTimeoutError("Too little of the request budget left to call Gemini")
+            started = True
+            with span("llm"):
+                # Gemini's own timeouts still apply; the budget only shortens them
+                async for piece in stream_gemini_llm_async(prompt, budget=budget):
+                    for number, answer in parser.feed(piece):
+                        offset = number - 1
+                        if not 0 <= offset < len(questions):
+                            logger.warning("Gemini answered question %d of %d", number, len(questions))
+                        elif answered[offset]:
+                            logger.warning("Gemini answered question %d twice; keeping the first", number)
+                        else:
+                            answered[offset] = True
+                            yield offset, answer, True
+    except CircuitOpenError:
+        logger.info("Gemini circuit open; answering %d questions heuristically", answered.count(False))
+        if deadline is not None:
+            deadline.degrade("llm_circuit_open")
+    except LLMTimeoutError as e:
+        logger.warning("Gemini timed out for a shard of %d questions: %s", len(questions), e)
+        if deadline is not None:
+            deadline.degrade("llm_timeout" if started else "llm_skipped")
+    except LLMError as e:
+        logger.warning("Gemini call failed for a shard of %d questions: %s", len(questions), e)
+        if deadline is not None:
+            deadline.degrade("llm_error")
+    else:
+        if not parser.closed:
+            logger.warning("Gemini's answers were cut off or malformed after %d of %d",
+                           answered.count(True), len(questions))
+        elif not all(answered):
+            logger.warning("Gemini left %d of %d questions unanswered", answered.count(False), len(questions))
+
+    # 3. Fallback to heuristics for the questions Gemini did not answer
+    missing = [offset for offset, done in enumerate(answered) if not done]
+    if missing:
+        fallback = await _heuristic_answers(
+            [questions[i] for i in missing], [per_question[i] for i in missing], namespace
+        )
+        for offset, answer in zip(missing, fallback):
+            yield offset, answer, False
+
+
+async def _stream_llm_answers(
+    questions: List[str],
+    top_k: int,
+    namespace: str,
+    vectors: Optional[List[List[float]]] = None,
+    deadline: Optional[Deadline] = None,
+) -> AsyncIterator[Tuple[int, str, bool]]:
+    """
+    Retrieval + LLM + fallback for questions that missed the caches.
+    `vectors` are the questions' embeddings if already computed.
+    Questions are split into shards of SHARD_SIZE that are generated
+    concurrently, so one bad response only costs its own shard.
+    With a deadline, retrieval narrows (fewer chunks, sparse only) when time
+    is short, and shards fall back to heuristics when it runs out.
+    Yields (question index, answer, True if from the LLM) in completion order.
+    """
+    source_id = namespace  # namespace-per-document, tagged on every vector
+    fltr = {"source": {"$eq": source_id}}
+    mode = RETRIEVAL_MODE
+    if vectors is None and mode == "hybrid":
+        mode = "sparse"  # embedding already failed for these questions; don't retry it
+    if deadline is not None:
+        if vectors is None and ("partial_index" in deadline.degradations or "sparse_retrieval" in deadline.degradations):
+            mode = "sparse"  # document not embedded yet, or no time to embed the questions
+        if top_k > 3 and deadline.available() < 2 * LLM_MIN_SECONDS:
+            top_k = max(3, top_k // 2)  # smaller prompt, faster first token
+            deadline.degrade("reduced_top_k")
+
+    # Retrieve per question for the whole batch (one batched embedding call)
+    search = semantic_search_many_async(
+        questions, top_k=top_k, namespace=namespace, fltr=fltr, mode=mode, vectors=vectors
+    )
+    if deadline is None or mode == "sparse":
+        per_question = await search
+    else:
+        try:
+            per_question = await asyncio.wait_for(search, deadline.available(FALLBACK_RESERVE_SECONDS + LLM_MIN_SECONDS))
+        except asyncio.TimeoutError:
+            deadline.degrade("sparse_retrieval")  # the vector store is too slow today; BM25 is local
+            per_question = await semantic_search_many_async(
+                questions, top_k=top_k, namespace=namespace, fltr=fltr, mode="sparse"
             )
-            for q in questions
-        ]
 
-    # 4. Attempt to parse the JSON from Gemini
+    shards = _shards(len(questions))
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run(shard: range) -> None:
+        try:
+            async for offset, answer, ok in _stream_shard(
+                [questions[i] for i in shard], [per_question[i] for i in shard], namespace, deadline
+            ):
+                queue.put_nowait((shard[offset], answer, ok))
+        finally:
+            queue.put_nowait(None)
+
+    tasks = [asyncio.create_task(run(shard)) for shard in shards]
+    fallbacks = 0
     try:
-        # In case Gemini wraps response inside 'candidates[0].content.parts[0].text' format
-        if isinstance(raw_response, dict):
-            text = (
-                raw_response.get("candidates", [{}])[0]
-                .get("content", {})
-                .get("parts", [{}])[0]
-                .get("text", "")
-            )
-        else:
-            text = raw_response
-
-        parsed = json.loads(text.strip())
-        answers = parsed.get("answers")
-
-        if isinstance(answers, list) and len(answers) == len(questions):
-            return answers
-    except (json.JSONDecodeError, KeyError, IndexError, TypeError):
-        pass  # fallback
-
-    # 5. Fallback if JSON was invalid or misaligned
-    fallback_answers = []
-    for q in questions:
-        retrieved = semantic_search(
-            q,
-            top_k=top_k,
-            namespace=namespace,
-            fltr={"source": {"$eq": source_id}},
+        pending = len(tasks)
+        while pending:
+            item = await queue.get()
+            if item is None:
+                pending -= 1
+                continue
+            fallbacks += not item[2]
+            yield item
+        for task in tasks:
+            task.result()  # surface unexpected errors
+    finally:
+        for task in tasks:
+            task.cancel()
+    if len(shards) > 1:
+        logger.info("Answered %d questions in %d shards (%d from fallback)",
+                    len(questions), len(shards), fallbacks)
+
+
+async def stream_answers(
+    document_url: str,
+    questions: List[str],
+    top_k: int = 8,
+    namespace: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+) -> AsyncIterator[Tuple[int, str, str]]:
+    """
+    Full question-answer pipeline: answer caches + retrieval + LLM + fallback.
+    Yields (question index, answer, source) as soon as each answer is ready,
+    where source is "cache", "semantic", "llm" or "fallback"; cached answers
+    come first, LLM answers as Gemini streams each one.
+    `namespace` is what `ingest_document` returned; without it we fall back to
+    the manifest entry for the URL, then to the legacy URL hash.
+    Duplicate questions are answered once. Exact-text cache misses are embedded
+    once; those embeddings serve both the semantic question cache and
+    retrieval, and only questions missing both caches reach the LLM.
+    With a `deadline`, every stage keeps inside the remaining budget and
+    records what it gave up (see backend.services.deadline); answers from
+    degraded retrieval are not cached.
+    """
+    if namespace is None:
+        namespace = (
+            await run_io(manifest.namespace_for_url, document_url)
+            or hashlib.md5(document_url.encode()).hexdigest()
         )
-        fallback_answers.append(answer_one_question(q, retrieved))
+    # Without a manifest entry the namespace is still being written (possibly over
+    # an older version), so its answers cannot be tied to a document version:
+    # neither answer cache is read or written
+    doc_hash = await run_io(manifest.content_hash_for, namespace)
+
+    # Collapse duplicates (after normalization), keeping first-seen wording
+    unique: Dict[str, str] = {}
+    positions: Dict[str, List[int]] = {}
+    for i, q in enumerate(questions):
+        n = normalize_question(q)
+        unique.setdefault(n, q)
+        positions.setdefault(n, []).append(i)
+    norms = list(unique)
+    keys = [answer_key(doc_hash, unique[n], PROMPT_VERSION, LLM_MODEL) for n in norms] if doc_hash else []
+    cached = await run_io(answer_cache.get_many, keys) if doc_hash else [None] * len(norms)
+    misses = []
+    for n, answer in zip(norms, cached):
+        if answer is None:
+            misses.append(n)
+            continue
+        ANSWERS.inc(len(positions[n]), source="cache")
+        for i in positions[n]:
+            yield i, answer, "cache"
+    if not misses:
+        return
+
+    # Near-duplicate questions, using the embeddings retrieval needs anyway
+    semantic_key = f"{doc_hash}:{PROMPT_VERSION}:{LLM_MODEL}"
+    vectors: Optional[List[List[float]]] = None
+    embed = RETRIEVAL_MODE != "sparse"  # sparse-only mode makes no embedding calls at all
+    if embed and deadline is not None and "partial_index" in deadline.degradations:
+        embed = False  # the document's vectors are not there yet; retrieval is sparse
+    if embed:
+        try:
+            embedding = aget_embeddings([unique[n] for n in misses])
+            if deadline is None:
+                vectors = await embedding
+            else:
+                vectors = await asyncio.wait_for(embedding, deadline.available(FALLBACK_RESERVE_SECONDS + LLM_MIN_SECONDS))
+        except asyncio.TimeoutError as e:
+            if deadline is None:
+                logger.warning("Question embedding timed out (%s); skipping semantic cache", e)
+            else:
+                deadline.degrade("sparse_retrieval")
+        except Exception as e:
+            logger.warning("Question embedding failed (%s); skipping semantic cache", e)
+    if vectors is not None and doc_hash:
+        similar = question_cache.lookup(semantic_key, vectors)
+        remaining = [i for i, hit in enumerate(similar) if hit is None]
+        for n, hit in zip(misses, similar):
+            if hit is not None:
+                ANSWERS.inc(len(positions[n]), source="semantic")
+                for i in positions[n]:
+                    yield i, hit[0], "semantic"
+        misses = [misses[i] for i in remaining]
+        vectors = [vectors[i] for i in remaining]
+    if not misses:
+        return
+
+    fresh: List[Tuple[int, str]] = []
+    async for m, answer, from_llm in _stream_llm_answers(
+        [unique[n] for n in misses], top_k, namespace, vectors, deadline
+    ):
+        source = "llm" if from_llm else "fallback"
+        ANSWERS.inc(len(positions[misses[m]]), source=source)
+        for i in positions[misses[m]]:
+            yield i, answer, source
+        if from_llm:
+            fresh.append((m, answer))
 
-    return fallback_answers
+    # Heuristic fallbacks are not cached so a recovered LLM can do better next time
+    if fresh and doc_hash and not (deadline is not None and deadline.retrieval_degraded):
+        key_for = dict(zip(norms, keys))
+        await run_io(answer_cache.put_many, [(key_for[misses[m]], a) for m, a in fresh])
+        if vectors is not None:
+            question_cache.add(semantic_key, [vectors[m] for m, _ in fresh], [a for _, a in fresh])
+
+
+async def answer_questions_async(
+    document_url: str,
+    questions: List[str],
+    top_k: int = 8,
+    namespace: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+) -> List[str]:
+    """
+    Collects stream_answers into a list of answers aligned with `questions`.
+    """
+    answers: List[Optional[str]] = [None] * len(questions)
+    async for i, answer, _ in stream_answers(
+        document_url, questions, top_k=top_k, namespace=namespace, deadline=deadline
+    ):
+        answers[i] = answer
+    return answers
+
+
+def answer_questions(
+    document_url: str,
+    questions: List[str],
+    top_k: int = 8,
+    namespace: Optional[str] = None,
+) -> List[str]:
+    """
+    Blocking wrapper around answer_questions_async for scripts and sync endpoints.
+    """
+    return asyncio.run(answer_questions_async(document_url, questions, top_k=top_k, namespace=namespace))
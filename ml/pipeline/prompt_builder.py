@@ -1,5 +1,151 @@
-def build_llm_prompt(context_chunks, questions):
-    context = "\n\n".join([chunk.get("text", "") for chunk in context_chunks])
+import os
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from backend.services.sentence_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the prompt wording or output contract changes; cached answers key on it
+PROMPT_VERSION = "2"
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1.0 = pure relevance, 0.0 = pure diversity
+CHARS_PER_TOKEN = 4  # rough estimate for English prose
+_MIN_OVERLAP = 20
+_MAX_OVERLAP = 600  # chunk_text overlap is 250 chars; leave headroom
+_MIN_TRUNCATED_TOKENS = 64
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _join_overlapping(a: str, b: str) -> str:
+    """
+    Append b to a, dropping the longest prefix of b that a already ends with.
+    """
+    probe = b[:_MIN_OVERLAP]
+    if len(probe) == _MIN_OVERLAP:
+        start = max(0, len(a) - _MAX_OVERLAP)
+        pos = a.find(probe, start)
+        while pos != -1:
+            tail = a[pos:]
+            if b.startswith(tail):
+                return a + b[len(tail):]
+            pos = a.find(probe, pos + 1)
+    return a + "\n" + b
+
+
+def _merge_neighbours(chunks: List[Dict]) -> List[Dict]:
+    """
+    Merge chunks whose chunk_index values are adjacent into one span, removing
+    the text the splitter repeated between them. Exact duplicates are dropped.
+    """
+    indexed = [c for c in chunks if isinstance(c.get("chunk_index"), int)]
+    loose = [c for c in chunks if not isinstance(c.get("chunk_index"), int)]
+
+    by_index: Dict[Tuple, Dict] = {}
+    for c in indexed:
+        key = (c.get("source"), c["chunk_index"])
+        if key not in by_index or (c.get("score") or 0) > (by_index[key].get("score") or 0):
+            by_index[key] = c
+
+    groups: List[Dict] = []
+    for (source, idx), c in sorted(by_index.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+        last = groups[-1] if groups else None
+        if last is not None and last["source"] == source and last["last_index"] == idx - 1:
+            last["text"] = _join_overlapping(last["text"], c.get("text", ""))
+            last["last_index"] = idx
+            last["score"] = max(last["score"], c.get("score") or 0.0)
+        else:
+            groups.append({
+                "text": c.get("text", ""),
+                "source": source,
+                "chunk_index": idx,
+                "last_index": idx,
+                "score": c.get("score") or 0.0,
+            })
+
+    seen = {g["text"] for g in groups}
+    for c in loose:
+        text = c.get("text", "")
+        if text and text not in seen:
+            seen.add(text)
+            groups.append({"text": text, "source": c.get("source"), "chunk_index": None,
+                           "last_index": None, "score": c.get("score") or 0.0})
+    return [g for g in groups if g["text"].strip()]
+
+
+def _mmr_order(groups: List[Dict], lam: float) -> List[Dict]:
+    """
+    Maximal marginal relevance: relevance is the (max-normalized) retrieval score,
+    redundancy is token-set Jaccard similarity to spans already chosen.
+    """
+    if len(groups) <= 1:
+        return groups
+    top = max(g["score"] for g in groups) or 1.0
+    relevance = [g["score"] / top for g in groups]
+    tokens = [set(tokenize(g["text"])) for g in groups]
+    redundancy = [0.0] * len(groups)
+    remaining = list(range(len(groups)))
+    ordered: List[Dict] = []
+    while remaining:
+        best = max(remaining, key=lambda i: lam * relevance[i] - (1 - lam) * redundancy[i])
+        remaining.remove(best)
+        ordered.append(groups[best])
+        for i in remaining:
+            union = len(tokens[i] | tokens[best]) or 1
+            redundancy[i] = max(redundancy[i], len(tokens[i] & tokens[best]) / union)
+    return ordered
+
+
+def _truncate_to_tokens(text: str, tokens: int) -> str:
+    cut = text[: tokens * CHARS_PER_TOKEN]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    return cut[: boundary + 1] if boundary > len(cut) // 2 else cut
+
+
+def pack_context(
+    context_chunks: List[Dict],
+    token_budget: Optional[int] = None,
+    mmr_lambda: float = MMR_LAMBDA,
+) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Turn retrieved chunks into prompt excerpts: merge adjacent neighbours
+    (dropping the repeated overlap), order by MMR and fill the token budget.
+    Returns (excerpts, stats) where stats reports estimated tokens saved.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    raw_tokens = sum(estimate_tokens(c.get("text", "")) for c in context_chunks)
+
+    excerpts: List[str] = []
+    used = 0
+    for group in _mmr_order(_merge_neighbours(context_chunks), mmr_lambda):
+        cost = estimate_tokens(group["text"])
+        if used + cost <= budget:
+            excerpts.append(group["text"])
+            used += cost
+        elif budget - used >= _MIN_TRUNCATED_TOKENS:
+            excerpts.append(_truncate_to_tokens(group["text"], budget - used))
+            used = budget
+        if used >= budget:
+            break
+
+    stats = {
+        "chunks_in": len(context_chunks),
+        "excerpts_out": len(excerpts),
+        "tokens_in": raw_tokens,
+        "tokens_out": used,
+        "tokens_saved": raw_tokens - used,
+    }
+    logger.info("Packed context: %s", stats)
+    return excerpts, stats
+
+
+def build_llm_prompt(context_chunks, questions, token_budget: Optional[int] = None):
+    excerpts, _ = pack_context(context_chunks, token_budget=token_budget)
+    context = "\n\n".join(excerpts)
     numbered_qs = "\n".join([f"{i+1}. {q}" for i, q in enumerate(questions)])
 
     return f"""
@@ -17,6 +163,7 @@ If the context does not clearly contain an answer, reply with:
 - ❌ Do NOT include explanations, assumptions, or reasoning.
 - ✅ DO paraphrase into clear, natural language.
 - ✅ DO keep each answer to a **single sentence**.
+- ✅ DO tag each answer with its question number as "i", one answer per question.
 
 ---
 
@@ -31,7 +178,7 @@ Pre-existing diseases shall be covered after a waiting period of 48 months from
 **Expected Answer Format (in JSON):**
 {{
   "answers": [
-    "Pre-existing conditions are covered after 48 months."
+    {{"i": 1, "answer": "Pre-existing conditions are covered after 48 months."}}
   ]
 }}
 
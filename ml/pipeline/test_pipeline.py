@@ -1,4 +1,4 @@
-from backend.services.pinecone_store import ingest_document
+from backend.services.ingestion import ingest_document
 from ml.pipeline.pipeline_qa import answer_questions
 import sys
 
@@ -11,7 +11,7 @@ def run_pipeline_from_url(url, questions):
         print(f"✅ Document ingested. Source ID / namespace: {source_id}")
 
         # Step 5–7: Answer questions (retrieval + Gemini / fallback)
-        answers = answer_questions(document_url=url, questions=questions, top_k=8)
+        answers = answer_questions(document_url=url, questions=questions, top_k=8, namespace=source_id)
 
         print("🧠 Answers:")
         for i, (q, a) in enumerate(zip(questions, answers), 1):